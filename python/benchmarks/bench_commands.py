@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+# Cost of building and batching poll and setter commands, compared to formatting every command like the zones used to.
+# Run from the python directory: python3 benchmarks/bench_commands.py
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from proaudio_remote.commands import *
+
+CMDS = ('VPZ', 'VMZ', 'BAZ', 'TRZ', 'LZ', 'LSZ', 'EQ1Z', 'EQ2Z', 'EQ3Z', 'EQ4Z', 'EQ5Z', 'SZ', 'DZ', 'ATZ')
+ZONES = range(1, 129)
+ROUNDS = 20
+
+class Template():
+    # precomputed per (zone, attribute), like ZoneValue keeps them
+    def __init__(self, cmd, zone):
+        self.zone = zone
+        zonefmt = "{0:03d}".format(zone)
+        self.query = query_command(cmd, zonefmt)
+        self.prefix = command_prefix(cmd, zonefmt)
+
+def legacy_poll(values):
+    # a query per value, joined and encoded per burst
+    for _ in range(ROUNDS):
+        cmds = ["^{} @{}?$".format(cmd, "{0:03d}".format(zone)) for cmd, zone in values]
+        data = ''.join(cmds).encode()
+    return len(data)
+
+def template_poll(templates):
+    tx = SendBuffer()
+    for _ in range(ROUNDS):
+        tx.clear()
+        tx.write_all([tpl.query for tpl in templates])
+    return len(tx)
+
+def legacy_set(values):
+    for _ in range(ROUNDS):
+        cmds = ["^{} @{},{}$".format(cmd, "{0:03d}".format(zone), str(zone)) for cmd, zone in values]
+        data = ''.join(cmds).encode()
+    return len(data)
+
+def template_set(templates):
+    tx = SendBuffer()
+    for _ in range(ROUNDS):
+        tx.clear()
+        tx.write_all([build_command(tpl.prefix, str(tpl.zone)) for tpl in templates])
+    return len(tx)
+
+def bench(name, fn, arg, nb_cmds):
+    runs = 10
+    best = None
+    while runs > 0:
+        runs -= 1
+        start = time.perf_counter()
+        fn(arg)
+        duration = time.perf_counter() - start
+        best = duration if (best is None) else min(best, duration)
+    tracemalloc.start()
+    fn(arg)
+    allocated = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print("{:<10} {:>12.0f} commands/s {:>10.2f} us/command {:>10} bytes peak".format(
+        name, nb_cmds / best, best / nb_cmds * 1e6, allocated))
+
+values = [(cmd, zone) for zone in ZONES for cmd in CMDS]
+templates = [Template(cmd, zone) for cmd, zone in values]
+nb_cmds = len(values) * ROUNDS
+print("{} values, {} rounds:".format(len(values), ROUNDS))
+bench("legacy", legacy_poll, values, nb_cmds)
+bench("template", template_poll, templates, nb_cmds)
+print("setters:")
+bench("legacy", legacy_set, values, nb_cmds)
+bench("template", template_set, templates, nb_cmds)
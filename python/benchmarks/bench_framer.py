@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+# Throughput of the ^...$ stream framer, compared to splitting every received chunk like Connection used to.
+# Run from the python directory: python3 benchmarks/bench_framer.py
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from proaudio_remote.framer import FrameBuffer
+
+def make_stream(nb_responses):
+    data = b''
+    zone = 0
+    while zone < nb_responses:
+        zone += 1
+        data += "^+$\r\n^=VPZ @{0:03d},{1}$\r\n".format(zone % 128, zone % 100).encode()
+    return data
+
+def make_segments(data, max_segment):
+    # split the stream like TCP would: some frames are coalesced, others split over multiple segments
+    rnd = random.Random(42)
+    rv = []
+    pos = 0
+    while pos < len(data):
+        nb = rnd.randint(1, max_segment)
+        rv.append(data[pos:pos + nb])
+        pos += nb
+    return rv
+
+def run_legacy(segments):
+    # one decode and split per received segment, the tail of split frames is lost
+    nb = 0
+    for segment in segments:
+        for line in segment.decode(errors='replace').split("\r\n"):
+            if (len(line) > 1) and (line[0] == '^') and (line[-1] == '$'):
+                nb += 1
+    return nb
+
+def run_framer(segments):
+    nb = 0
+    rx = FrameBuffer()
+    for segment in segments:
+        rx.feed(segment)
+        nb += len(rx.frames())
+    return nb
+
+def bench(name, fn, segments, nb_bytes, expected):
+    runs = 5
+    best = None
+    nb = 0
+    while runs > 0:
+        runs -= 1
+        start = time.perf_counter()
+        nb = fn(segments)
+        duration = time.perf_counter() - start
+        best = duration if (best is None) else min(best, duration)
+    print("{:<8} {:>10.1f} MB/s {:>12.0f} frames/s  {} of {} frames".format(
+        name, nb_bytes / best / 1e6, nb / best, nb, expected))
+
+data = make_stream(100000)
+expected = 200000
+for max_segment in (16, 256, 1024, 8192):
+    segments = make_segments(data, max_segment)
+    print("segments up to {} bytes:".format(max_segment))
+    bench("legacy", run_legacy, segments, len(data), expected)
+    bench("framer", run_framer, segments, len(data), expected)
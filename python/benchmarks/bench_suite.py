@@ -0,0 +1,235 @@
+#!/usr/bin/python3
+# Microbenchmarks of the protocol and cache code paths that run for every polled value, compared to a saved baseline.
+# Run from the python directory:
+#   python3 benchmarks/bench_suite.py             compare with benchmarks/baseline.json, exit code 1 on a regression
+#   python3 benchmarks/bench_suite.py --save      store the results as new baseline
+#   python3 benchmarks/bench_suite.py -k parse    only run the benchmarks with "parse" in their name
+# Every benchmark is measured in several interleaved rounds (--rounds) and the best round is compared. a benchmark
+# that is slower than the threshold is measured again (--retries) before it's reported, a noisy machine only makes
+# a round slower, a regression makes every round slower.
+# Baselines depend on the machine and python version, save them on the machine that the comparison runs on.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from proaudio_remote import *
+from proaudio_remote.framer import FrameBuffer
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+MODELS = ("ProAudio8", "ProAudio16", "ProAudio32", "ProAudio64")
+
+# responses like the switch sends them while polling
+FRAMES = [
+    b'^=VPZ @001,50$',
+    b'^=VMZ @017,1$',
+    b'^=EQ3Z @064,134$',
+    b'^=SZ @012,045$',
+    b'^=ATZ @008,2$',
+    b'^=V "ProAudio64",1.8,SN012345$',
+]
+
+class BenchRemote(RemoteBase):
+    # remote without connection, zones are only read from the cache
+    blocking = False
+
+    def __init__(self, model):
+        super().__init__(model)
+        self._create_ports()
+
+def _remote(model="ProAudio64", values=True):
+    remote = BenchRemote(model)
+    if values:
+        # all zones created with a fresh value
+        for bay in remote.inputs + remote.outputs:
+            for val in bay.values:
+                val.set(val._decode('1'))
+    return remote
+
+def bench_parse_response():
+    frames = FRAMES
+    def run():
+        for frame in frames:
+            parse_response(frame)
+    return run, len(frames)
+
+def bench_zone_resp():
+    frames = FRAMES
+    def run():
+        for frame in frames:
+            CommandResponse.from_frame(None, frame).zone_resp()
+    return run, len(frames)
+
+def bench_framer():
+    data = b''.join(b'^+$\r\n' + frame + b'\r\n' for frame in FRAMES)
+    rx = FrameBuffer()
+    def run():
+        rx.feed(data)
+        rx.frames()
+    return run, 2 * len(FRAMES)
+
+def bench_value_get():
+    val = _remote().outputs[0].value('volume')
+    def run():
+        val.get()
+    return run, 1
+
+def bench_value_poll():
+    val = _remote().outputs[0].value('volume')
+    def run():
+        val.poll()
+    return run, 1
+
+def bench_zone_poll():
+    bay = _remote().outputs[0]
+    def run():
+        bay.poll()
+    return run, 1
+
+def bench_get_by_id():
+    remote = _remote(values=False)
+    ids = list(range(1, 65))
+    def run():
+        for nb in ids:
+            remote.get_by_id(True, False, nb)
+    return run, len(ids)
+
+def bench_get_by_name():
+    remote = _remote(values=False)
+    names = [AudioZoneAnalogIn.zone_name(nb) for nb in range(1, 65)]
+    def run():
+        for name in names:
+            remote.get_by_name(True, False, name)
+    return run, len(names)
+
+def _bench_create_ports(model):
+    def bench():
+        def run():
+            BenchRemote(model)
+        return run, 1
+    return bench
+
+def _bench_create_zones(model):
+    def bench():
+        def run():
+            remote = BenchRemote(model)
+            list(remote.inputs + remote.outputs)
+        return run, 1
+    return bench
+
+def bench_query():
+    values = _remote().outputs[0].values
+    def run():
+        for val in values:
+            val.query
+    return run, len(values)
+
+def bench_command():
+    val = _remote().outputs[0].value('volume')
+    def run():
+        val.command(val.encode(42))
+    return run, 1
+
+def bench_on_update():
+    remote = _remote()
+    def run():
+        remote.on_update(b'^=VPZ @001,50$')
+    return run, 1
+
+def bench_dispatch_updates():
+    # a poll cycle that changed the volume of every analog output, reported to a subscriber
+    remote = _remote()
+    remote.subscribe(lambda events: None)
+    values = [bay.value('volume') for bay in remote.outputs_analog]
+    volume = [0]
+    def run():
+        volume[0] ^= 1
+        for val in values:
+            val.set(volume[0])
+        remote._dispatch_updates()
+    return run, len(values)
+
+BENCHMARKS = [
+    ('parse_response', bench_parse_response),
+    ('zone_resp', bench_zone_resp),
+    ('framer', bench_framer),
+    ('value_get', bench_value_get),
+    ('value_poll', bench_value_poll),
+    ('zone_poll', bench_zone_poll),
+    ('get_by_id', bench_get_by_id),
+    ('get_by_name', bench_get_by_name),
+    ('query', bench_query),
+    ('command', bench_command),
+    ('on_update', bench_on_update),
+    ('dispatch_updates', bench_dispatch_updates),
+] + [('create_ports_' + model, _bench_create_ports(model)) for model in MODELS] \
+  + [('create_zones_' + model, _bench_create_zones(model)) for model in MODELS]
+
+def calibrate(bench, min_time=0.05):
+    """ timer and loop count for a benchmark so that one repeat takes at least min_time """
+    run, ops = bench()
+    timer = timeit.Timer(run)
+    loops = 1
+    while timer.timeit(loops) < min_time:
+        loops *= 2
+    return timer, loops, ops
+
+def measure(timer, loops, ops, repeat=5):
+    """ best time per operation in ns """
+    return min(timer.repeat(repeat, loops)) / loops / ops * 1e9
+
+def main():
+    parser = argparse.ArgumentParser(description="protocol and cache microbenchmarks")
+    parser.add_argument('--save', action='store_true', help="store the results as baseline")
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=1.3, help="slowdown compared to the baseline that fails")
+    parser.add_argument('-k', dest='filter', default=None, help="only run benchmarks with this in their name")
+    parser.add_argument('--rounds', type=int, default=5, help="rounds over all benchmarks, the best round is reported")
+    parser.add_argument('--retries', type=int, default=5, help="rounds to confirm a benchmark that is slower than the threshold")
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('results', {})
+
+    timers = [(name, calibrate(bench)) for name, bench in BENCHMARKS if (args.filter is None) or (args.filter in name)]
+    # the benchmarks are interleaved, so a slow moment of the machine only affects one round of each
+    results = {name: float('inf') for name, _ in timers}
+    for _ in range(args.rounds):
+        for name, timer in timers:
+            results[name] = min(results[name], measure(*timer))
+
+    regressions = []
+    for name, timer in timers:
+        line = "{:<24} {:>14.1f} ns/op"
+        if name in baseline:
+            retries = args.retries
+            while (results[name] / baseline[name] > args.threshold) and (retries > 0):
+                time.sleep(1)
+                results[name] = min(results[name], measure(*timer))
+                retries -= 1
+            ratio = results[name] / baseline[name]
+            line += "  {:>6.2f}x baseline".format(ratio)
+            if ratio > args.threshold:
+                line += "  REGRESSION"
+                regressions.append(name)
+        print(line.format(name, results[name]))
+
+    if args.save:
+        data = {'python': platform.python_version(), 'machine': platform.machine(), 'results': results}
+        with open(args.baseline, 'w') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        print("saved baseline to " + args.baseline)
+    elif len(regressions) > 0:
+        print("{} regressions: {}".format(len(regressions), ', '.join(regressions)))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
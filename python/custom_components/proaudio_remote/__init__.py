@@ -4,7 +4,8 @@ from homeassistant.helpers.typing import (
     ConfigType
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.helpers.dispatcher import async_dispatcher_connect, dispatcher_send
+from homeassistant.core import callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect, async_dispatcher_send, dispatcher_send
 from homeassistant.components.number import DOMAIN as NUMBER_DOMAIN
 from homeassistant.components.media_player import DOMAIN as MEDIA_PLAYER_DOMAIN
 import proaudio_remote as p8
@@ -20,11 +21,24 @@ class ProAudioCallbacks(p8.RemoteCallbacks):
         dispatcher_send(self.hass, SIGNAL_PROAUDIO_DISCONNECTED, remote)
 
     def on_zone_updated(self, zone):
-        dispatcher_send(self.hass, SIGNAL_PROAUDIO_ZONE_UPDATE, zone)
+        self.on_zones_updated([zone])
+
+    def on_zones_updated(self, zones):
+        # called from the poll thread once per poll cycle. all changes are passed to the loop in a single call,
+        # and only the entities of the changed zones are woken up by their zone's signal
+        self.hass.loop.call_soon_threadsafe(self._async_zones_updated, zones)
+
+    @callback
+    def _async_zones_updated(self, zones):
+        for zone in zones:
+            async_dispatcher_send(self.hass, zone_signal(zone))
 
 async def async_setup(hass: HomeAssistantType, config: ConfigEntry) -> bool:
+    # the remote's poll thread refreshes all values and reports changes through ProAudioCallbacks.
+    # entities only read cached values, so writing their state in the event loop never touches the network
     hass.data[DOMAIN] = {
-            'remote': p8.Remote("proaudio.p8.dmb.opdenkamp.eu", callbacks=ProAudioCallbacks(hass)),
+            'remote': p8.Remote("proaudio.p8.dmb.opdenkamp.eu", callbacks=ProAudioCallbacks(hass),
+                                cache_file=hass.config.path(".storage", DOMAIN + ".cache"), blocking=False),
             'registered': False,
             'sensors_registered': False,
     }
@@ -10,7 +10,8 @@ from homeassistant.components.media_player.const import (
 DOMAIN="proaudio_remote"
 SIGNAL_PROAUDIO_CONNECTED = "proaudio_connected"
 SIGNAL_PROAUDIO_DISCONNECTED = "proaudio_disconnected"
-SIGNAL_PROAUDIO_ZONE_UPDATE = "proaudio_zone_update"
+# per zone, see zone_signal()
+SIGNAL_PROAUDIO_ZONE_UPDATE = "proaudio_zone_update_{}"
 
 SUPPORT_BAY_AUDIO_OUTPUT = (
     SUPPORT_VOLUME_MUTE
@@ -21,3 +22,6 @@ SUPPORT_BAY_AUDIO_OUTPUT = (
     | SUPPORT_SELECT_SOURCE
 )
 
+def zone_signal(zone):
+    """ dispatcher signal that is sent when a value of zone was changed """
+    return SIGNAL_PROAUDIO_ZONE_UPDATE.format(repr(zone))
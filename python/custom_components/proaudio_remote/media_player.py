@@ -8,6 +8,7 @@ from homeassistant.const import (
     STATE_UNAVAILABLE,
 )
 from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import callback
 from homeassistant.helpers.typing import (
     HomeAssistantType,
     ConfigType
@@ -17,13 +18,15 @@ from homeassistant.helpers.dispatcher import async_dispatcher_connect
 import proaudio_remote as p8
 from datetime import *
 
+import asyncio
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 #_LOGGER.setLevel(logging.DEBUG)
 
 def setup_proaudio(hass, add_entities):
-    if not hass.data[DOMAIN]['remote'].connected:
+    # the zones are known after connecting, or right away when they're restored from the cache
+    if not hass.data[DOMAIN]['remote'].ready:
         return False
     if hass.data[DOMAIN]['registered']:
         return True
@@ -53,16 +56,18 @@ class ProAudioEntity(MediaPlayerEntity):
         self._bay = bay
         async_dispatcher_connect(hass, SIGNAL_PROAUDIO_CONNECTED, self._on_connect)
         async_dispatcher_connect(hass, SIGNAL_PROAUDIO_DISCONNECTED, self._on_disconnect)
-        async_dispatcher_connect(hass, SIGNAL_PROAUDIO_ZONE_UPDATE, self._on_update)
+        async_dispatcher_connect(hass, zone_signal(bay), self._on_update)
 
-    def _on_update(self, zone):
-        if self._bay == zone:
-            self.async_write_ha_state()
+    @callback
+    def _on_update(self):
+        self.async_write_ha_state()
 
+    @callback
     def _on_connect(self, remote):
         _LOGGER.debug("connection restored")
         self.async_write_ha_state()
 
+    @callback
     def _on_disconnect(self, remote):
         _LOGGER.debug("connection lost")
         self.async_write_ha_state()
@@ -91,51 +96,45 @@ class ProAudioEntity(MediaPlayerEntity):
     def supported_features(self):
         return SUPPORT_BAY_AUDIO_OUTPUT
 
-    def set_volume_level(self, volume):
+    async def async_set_volume_level(self, volume):
         if not self.available:
             _LOGGER.warning("failed to update volume setting: not connected")
             return False
         try:
-            self._bay.volume = int(volume * 100)
+            # slider updates are coalesced, only the last volume is sent
+            self._bay.queue_set('volume', int(volume * 100))
+            self.async_write_ha_state()
             return True
         except Exception:
             return False
 
-    def volume_up(self):
+    async def _async_set(self, name, value):
+        # change a value without blocking the event loop, commands of concurrent calls are pipelined together
         if not self.available:
-            _LOGGER.warning("failed to update volume setting: not connected")
+            _LOGGER.warning("failed to update {} setting: not connected".format(name))
             return False
         try:
-            self._bay.volume = "+"
+            await self._bay.async_set(name, value)
+            self.async_write_ha_state()
             return True
-        except Exception:
+        except Exception as e:
+            _LOGGER.warning("failed to update {} setting: {}".format(name, str(e)))
             return False
 
-    def volume_down(self):
-        if not self.available:
-            _LOGGER.warning("failed to update volume setting: not connected")
-            return False
-        try:
-            self._bay.set_volume("-")
-            return True
-        except Exception:
-            return False
+    async def async_volume_up(self):
+        return await self._async_set('volume', "+")
 
-    def mute_volume(self, mute):
-        if not self.available:
-            _LOGGER.warning("failed to update mute setting: not connected")
-            return False
-        try:
-            self._bay.mute = mute
-            return True
-        except Exception:
-            return False
+    async def async_volume_down(self):
+        return await self._async_set('volume', "-")
+
+    async def async_mute_volume(self, mute):
+        return await self._async_set('mute', mute)
 
-    def turn_on(self):
-        return self.mute_volume(False)
+    async def async_turn_on(self):
+        return await self.async_mute_volume(False)
 
-    def turn_off(self):
-        return self.mute_volume(True)
+    async def async_turn_off(self):
+        return await self.async_mute_volume(True)
 
     @property
     def source(self):
@@ -167,14 +166,16 @@ class ProAudioEntity(MediaPlayerEntity):
         muted = self._bay.muted
         return muted if muted is not None else STATE_UNKNOWN
 
-    def select_source(self, source, power:bool=True):
+    async def async_select_source(self, source, power:bool=True):
         if not self.available:
             _LOGGER.warning("failed to switch to " + str(source) + ": not connected")
             return False
-        if power:
-            self.mute_volume(False)
         try:
-            self._bay.switch = source
+            # the source is switched before the output is unmuted, both commands are sent in one pipelined batch
+            calls = [self._bay.async_set('switch', source)]
+            if power:
+                calls.append(self._bay.async_set('mute', False))
+            await asyncio.gather(*calls)
             self.async_write_ha_state()
             _LOGGER.warning("switched to " + str(source))
             return True
@@ -18,7 +18,8 @@ _LOGGER.setLevel(logging.DEBUG)
 
 
 def setup_proaudio_sensors(hass, add_entities):
-    if not hass.data[DOMAIN]['remote'].connected:
+    # the zones are known after connecting, or right away when they're restored from the cache
+    if not hass.data[DOMAIN]['remote'].ready:
         return False
     if hass.data[DOMAIN]['sensors_registered']:
         return True
@@ -68,7 +69,7 @@ class P8AudioNumber(NumberEntity):
         #self._attr_entity_category = "TODO"
         self._attr_unique_id = "{} {} {} {}".format(DOMAIN, self._dev.serial, repr(self._bay), sns_type)
 
-        async_dispatcher_connect(self.hass, SIGNAL_PROAUDIO_ZONE_UPDATE, self._on_update)
+        async_dispatcher_connect(self.hass, zone_signal(bay), self._on_update)
 
     @property
     def should_poll(self):
@@ -81,25 +82,26 @@ class P8AudioNumber(NumberEntity):
             eqv = self._type[2]
             val = self._bay.get_eq_band(eqv)
         elif self._type == 'delay':
-            val = round(float(self._bay.delay) / 48.0, 2)
+            delay = self._bay.delay
+            val = round(float(delay) / 48.0, 2) if delay is not None else None
         else:
             raise Exception("invalid type")
         return val if val is not None else STATE_UNKNOWN
 
     async def async_set_native_value(self, value: float) -> None:
+        # slider updates are coalesced, only the last value is sent
         if self._type[0:2] == 'eq':
-            eqv = self._type[2]
-            self._bay.set_eq_band(eqv, value)
+            self._bay.queue_set(self._type, float(value))
             self.async_write_ha_state()
         elif self._type == 'delay':
-            self._bay.delay = int((value) * 48)
+            self._bay.queue_set('delay', int((value) * 48))
             self.async_write_ha_state()
         else:
             raise Exception("invalid type")
 
-    def _on_update(self, zone):
-        if self._bay == zone:
-            self.async_write_ha_state()
+    @callback
+    def _on_update(self):
+        self.async_write_ha_state()
 
     @property
     def available(self):
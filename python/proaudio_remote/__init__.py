@@ -1 +1,2 @@
 from .proaudio import *
+from .manager import *
@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from .response import *
+from .pipeline import *
+from .framer import *
+from .commands import *
+from .metrics import *
+from .capture import *
+
+_LOGGER = logging.getLogger(__name__)
+#_LOGGER.setLevel(logging.DEBUG)
+
+class AsyncConnectionCallback():
+    async def async_on_connected(self):
+        return True
+
+    def on_connection_lost(self):
+        pass
+
+    def on_update(self, data):
+        pass
+
+    async def async_poll(self):
+        pass
+
+    def next_poll(self):
+        # seconds until async_poll() has to be called again
+        return 1
+
+class AsyncConnection():
+    """ asyncio version of Connection, driven by tasks on the event loop instead of a thread """
+    def __init__(self, callback:AsyncConnectionCallback, target_ip:str, port:int=50005, pipeline_depth:int=16,
+                 recorder:CaptureRecorder=None, transport=None, command_timeout:float=5):
+        self._target_ip = target_ip
+        self._port = port
+        self._callback = callback
+        self._transport = transport
+        self.recorder = recorder
+        self.command_timeout = command_timeout
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._run_task = None
+        self.metrics = Metrics()
+        self._pipeline = CommandPipeline(pipeline_depth, self.metrics)
+        self._tx = SendBuffer()
+        self._last_rx = 0
+        self._last_connect = 0
+        self._stop = False
+        # set to poll again without waiting for next_poll(), see wakeup()
+        self._wakeup = asyncio.Event()
+
+    @property
+    def target_ip(self):
+        return self._target_ip
+
+    @property
+    def connected(self):
+        return (self._writer is not None)
+
+    def start(self):
+        """ start the task that connects to the switch and polls it """
+        if self._run_task is None:
+            self._stop = False
+            self._run_task = asyncio.ensure_future(self._run())
+
+    async def async_close(self):
+        self._stop = True
+        if self._run_task is not None:
+            self._run_task.cancel()
+            self._run_task = None
+        self._close_socket(False)
+        if self.recorder is not None:
+            self.recorder.close()
+
+    async def async_send_command(self, cmd, key=None, timeout:float=None):
+        """ send a command and return its response. raises CommandTimeout if there's no response within timeout seconds """
+        return (await self.async_send_many([cmd], [key], timeout=timeout))[0]
+
+    def submit(self, cmd, key=None, deadline=None):
+        """ send a command, returns a future that is resolved with the response.
+            deadline is the time.perf_counter() after which it fails with CommandTimeout """
+        if self._writer is None:
+            raise Exception('not connected')
+        future = self._pipeline.submit(cmd, asyncio.get_running_loop().create_future(), key, deadline).future
+        self._send_queued()
+        return future
+
+    async def async_send_many(self, cmds, keys=None, return_exceptions=False, timeout:float=None):
+        """ send a batch of commands, keeping multiple commands in flight. returns the response per command.
+            keys are the (command, zone) of the commands, they're parsed from the commands if not given.
+            with return_exceptions, commands that failed return their exception instead of raising it.
+            commands that weren't answered within timeout seconds fail with CommandTimeout, by default
+            command_timeout plus the time to send the batch through a full pipeline. commands that weren't
+            sent yet are cancelled when the calling task is cancelled """
+        if keys is None:
+            keys = [None] * len(cmds)
+        if timeout is None:
+            timeout = self.command_timeout + len(cmds) / self._pipeline.depth
+        deadline = time.perf_counter() + timeout
+        futures = [self.submit(cmd, key, deadline) for cmd, key in zip(cmds, keys)]
+        if len(futures) == 0:
+            return []
+        start = time.monotonic()
+        try:
+            pending = (await asyncio.wait(futures, timeout=timeout))[1]
+        except asyncio.CancelledError:
+            for f in futures:
+                f.cancel()
+            raise
+        if len(pending) > 0:
+            self.metrics.timeouts += len(pending)
+            exc = CommandTimeout("{} of {} commands weren't answered within {}s".format(len(pending), len(futures), timeout))
+            for f in pending:
+                # commands in flight stay in the pipeline until their response is received
+                f.set_exception(exc)
+            if time.monotonic() - max(self._last_rx, start) >= self.command_timeout:
+                # nothing was received for as long as a command may take, the connection is dead
+                self._close_socket(True)
+        if return_exceptions:
+            return [f.exception() or f.result() for f in futures]
+        return [f.result() for f in futures]
+
+    def cancel_queued(self):
+        """ cancel the commands that weren't sent yet, returns the number of commands """
+        return self._pipeline.cancel_queued()
+
+    def wakeup(self):
+        """ wake up the poll task, which polls again and waits for next_poll() again """
+        self._wakeup.set()
+
+    def _send_queued(self):
+        # also stops waiting for late responses to commands that failed a while ago
+        self._pipeline.expire()
+        pending = self._pipeline.next_to_send()
+        if len(pending) > 0:
+            self._tx.clear()
+            self._tx.write_all([p.cmd for p in pending])
+            # the transport may keep the data after write() returns, so it gets a copy of the buffer
+            data = bytes(self._tx.view())
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug('tx: ' + str(data))
+            self._writer.write(data)
+            self.metrics.bytes_sent += len(data)
+            self._record(TX, data)
+
+    async def async_connection(self):
+        now = time.time()
+        if (self._writer is not None) or ((now - self._last_connect) < 10):
+            return self._writer
+        self._last_connect = now
+        try:
+            if self._transport is not None:
+                sock = self._transport.connect(self._target_ip, self._port, 1)
+                self._reader, self._writer = await asyncio.open_connection(sock=sock)
+            else:
+                self._reader, self._writer = await asyncio.wait_for(asyncio.open_connection(self._target_ip, self._port), 1)
+            self.metrics.connects += 1
+            self._record(CONNECT)
+            _LOGGER.debug("connected to " + str(self._target_ip))
+        except Exception as e:
+            self._reader = None
+            self._writer = None
+            _LOGGER.debug("failed to connect to " + str(self._target_ip) + ": "+ str(e))
+            return None
+
+        self._read_task = asyncio.ensure_future(self._read_loop(self._reader))
+        try:
+            if not await self._callback.async_on_connected():
+                self._close_socket(False)
+        except Exception as e:
+            _LOGGER.debug("callback failed: " + str(e))
+            self._close_socket(True)
+            raise e
+        return self._writer
+
+    def _close_socket(self, notify):
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+        self._pipeline.fail_all(Exception('connection lost'))
+        if self._writer is not None:
+            self._writer.close()
+            self.metrics.disconnects += 1
+            self._record(DISCONNECT)
+            self._reader = None
+            self._writer = None
+            if notify:
+                self._callback.on_connection_lost()
+
+    async def _read_loop(self, reader):
+        rx = FrameBuffer()
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    raise ConnectionError('connection closed')
+                self.metrics.bytes_received += len(data)
+                self._last_rx = time.monotonic()
+                self._record(RX, data)
+                rx.feed(data)
+                for frame in rx.frames():
+                    if _LOGGER.isEnabledFor(logging.DEBUG):
+                        _LOGGER.debug('rx: ' + str(bytes(frame)))
+                    self._process_frame(frame)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            _LOGGER.debug("read failed: " + str(e))
+            self.metrics.errors += 1
+            self._read_task = None
+            self._close_socket(True)
+
+    def _process_frame(self, frame):
+        if self._pipeline.process_frame(frame):
+            self._send_queued()
+        else:
+            # process update
+            self.metrics.updates += 1
+            self._callback.on_update(bytes(frame))
+
+    def _record(self, direction, data=b''):
+        if self.recorder is not None:
+            self.recorder.record(direction, data)
+
+    async def _run(self):
+        _LOGGER.debug("connection task running")
+        while not self._stop:
+            wait = 1
+            try:
+                if await self.async_connection() is not None:
+                    await self._callback.async_poll()
+                    wait = self._callback.next_poll()
+            except asyncio.CancelledError:
+                raise
+            except CommandError as e:
+                # only socket errors drop the connection
+                _LOGGER.debug("poll failed: " + str(e))
+            except OSError:
+                self._close_socket(True)
+            except Exception as e:
+                _LOGGER.error("poll failed: " + str(e))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import time
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+# version of the file format
+_CACHE_VERSION = 1
+
+class StateCache():
+    """ Model, version, serial and the last known zone values of a switch, stored in a json file.
+        Values are stored like the switch returns them, by "CMD zone", so analog and digital outputs
+        that share a value only store it once. The file is replaced atomically when it's saved. """
+    def __init__(self, path:str, save_interval:float=60):
+        self.path = path
+        self.save_interval = save_interval
+        self.last_save = 0
+
+    def load(self):
+        """ returns (model_version, {(command, zone): value}), or None if there's no valid cache """
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            _LOGGER.warning("failed to read {}: {}".format(self.path, str(e)))
+            return None
+        if not isinstance(data, dict):
+            _LOGGER.warning("discarding {}, it isn't a cache file".format(self.path))
+            return None
+        if (data.get('v') != _CACHE_VERSION) or (data.get('model') is None):
+            return None
+        values = {}
+        for key, value in data.get('values', {}).items():
+            cmd, _, zone = key.partition(' ')
+            values[(cmd, zone)] = value
+        return (data['model'], values)
+
+    def save(self, model_version, values):
+        """ store model_version and the values, {(command, zone): value} """
+        data = {
+            'v': _CACHE_VERSION,
+            'time': int(time.time()),
+            'model': model_version,
+            'values': dict(("{} {}".format(key[0], key[1]), value) for key, value in values.items()),
+        }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix='.proaudio', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+        self.last_save = time.time()
+
+    @property
+    def due(self):
+        """ True if the cache has to be saved again """
+        return (time.time() - self.last_save) >= self.save_interval
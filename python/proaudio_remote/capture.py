@@ -0,0 +1,244 @@
+# Capture of the traffic between the client and a switch, and a transport that replays it, see replay.py
+
+from collections import deque
+import select
+import socket
+import struct
+import threading
+import time
+import logging
+from .framer import *
+from .response import *
+_LOGGER = logging.getLogger(__name__)
+
+_MAGIC = b'PACAP1\n'
+# record header: seconds since the start of the capture, direction and length of the data that follows
+_RECORD = struct.Struct('<dcI')
+
+# directions
+TX = b't'
+RX = b'r'
+CONNECT = b'c'
+DISCONNECT = b'd'
+
+class CaptureRecorder():
+    """ Writes all data that's sent to and received from a switch to a capture file, as it was passed
+        to the socket, with monotonic timestamps. Connects and disconnects are recorded as well. """
+    def __init__(self, path:str):
+        self.path = path
+        self.records = 0
+        self._file = open(path, 'wb')
+        self._file.write(_MAGIC)
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, direction, data=b''):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(_RECORD.pack(time.monotonic() - self._start, direction, len(data)))
+            self._file.write(data)
+            self.records += 1
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def read_capture(path:str):
+    """ all records of a capture file, as (timestamp, direction, data) """
+    rv = []
+    with open(path, 'rb') as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise Exception("not a capture file: " + str(path))
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                # the end of the file, or a record that was cut off when the capture was written
+                break
+            timestamp, direction, size = _RECORD.unpack(header)
+            data = f.read(size)
+            if len(data) < size:
+                break
+            rv.append((timestamp, direction, data))
+    return rv
+
+class ReplayTransport():
+    """ Transport for Connection and AsyncConnection that replays a capture instead of connecting to a switch.
+        Each connect replays the next recorded connection over a local socket pair. Every command that the client
+        sends is answered with the responses that were recorded for the same command, in recorded order and
+        repeating the last one once they're used up. Commands that weren't recorded, like a write of another
+        value, get the last response to the same (command, zone). The recorded latency is scaled by 1/speed, responses are sent
+        right away if speed is 0. Unsolicited updates are sent once the client sent as many commands as before
+        they were received, and at the recorded time unless speed is 0. A connection ends when all recorded
+        responses were used and the recorded duration passed, or when the client didn't send anything for
+        idle_timeout seconds. The last one isn't closed, commands are answered until the client disconnects.
+        When the capture ends new connections are refused and finished is set. """
+    def __init__(self, path:str, speed:float=1, idle_timeout:float=5):
+        self.path = path
+        self.speed = speed
+        self.idle_timeout = idle_timeout
+        # commands that the client sent that weren't recorded, and recorded responses that weren't used
+        self.mismatches = 0
+        self.finished = threading.Event()
+        self._sessions = self._split(read_capture(path))
+        # (command, zone) of all recorded commands
+        self.keys = set()
+        for records in self._sessions:
+            for timestamp, direction, data in records:
+                if direction == TX:
+                    self.keys.update(command_key(cmd) for cmd in _commands(data))
+
+    @staticmethod
+    def _split(records):
+        sessions = []
+        for record in records:
+            if (record[1] == CONNECT) or (len(sessions) == 0):
+                sessions.append([])
+            sessions[-1].append(record)
+        return sessions
+
+    def connect(self, target_ip, port, timeout):
+        """ returns the client side socket of the next recorded connection """
+        if len(self._sessions) == 0:
+            self.finished.set()
+            raise ConnectionRefusedError("end of capture " + str(self.path))
+        records = self._sessions.pop(0)
+        client, server = socket.socketpair()
+        client.settimeout(timeout)
+        threading.Thread(target=self._serve, args=(server, records, len(self._sessions) == 0), daemon=True).start()
+        return client
+
+    def wait(self, timeout=None):
+        """ wait until the whole capture was replayed. returns False on a timeout """
+        return self.finished.wait(timeout)
+
+    @staticmethod
+    def _index(records):
+        # {command: deque of (latency, response data)}, unsolicited updates as [(time, commands sent before, data)]
+        # and the duration of the connection. responses are matched to the commands like CommandPipeline does
+        replies = {}
+        updates = []
+        sent = deque()
+        acked = []
+        commands = 0
+        rx = FrameBuffer()
+        base = records[0][0]
+        for timestamp, direction, data in records:
+            if direction == TX:
+                for cmd in _commands(data):
+                    sent.append((command_key(cmd), cmd, timestamp))
+                    commands += 1
+            elif direction == RX:
+                rx.feed(data)
+                for frame in rx.frames():
+                    if (frame == b'^+$') and (len(sent) > 0):
+                        acked.append(sent.popleft())
+                    elif (frame == b'^!$') and (len(sent) > 0):
+                        key, cmd, tx = sent.popleft()
+                        replies.setdefault(cmd, deque()).append((timestamp - tx, b'^!$\r\n'))
+                    else:
+                        parsed = parse_response(frame)
+                        match = None
+                        if parsed is not None:
+                            match = next((entry for entry in acked if entry[0] == parsed[0]), None)
+                        if match is None:
+                            updates.append((timestamp - base, commands, bytes(frame) + b'\r\n'))
+                            continue
+                        acked.remove(match)
+                        replies.setdefault(match[1], deque()).append((timestamp - match[2], b'^+$\r\n' + bytes(frame) + b'\r\n'))
+        return replies, updates, records[-1][0] - base
+
+    def _serve(self, sock, records, last):
+        replies, updates, duration = self._index(records)
+        used = set()
+        # the last recorded command per (command, zone)
+        commands_by_key = {command_key(cmd): cmd for cmd in replies}
+        received = b''
+        commands = 0
+        ended = False
+        start = time.monotonic()
+        last_rx = start
+        # time at which the last response was sent, responses are sent in the order of the commands
+        last_tx = start
+        try:
+            while True:
+                now = time.monotonic()
+                while (len(updates) > 0) and (commands >= updates[0][1]) and ((self.speed == 0) or (now - start >= updates[0][0] / self.speed)):
+                    sock.sendall(updates.pop(0)[2])
+                wait = None
+                if not ended:
+                    done = (len(updates) == 0) and all((len(queue) == 1) and (cmd in used) for cmd, queue in replies.items())
+                    idle = (now - last_rx >= self.idle_timeout)
+                    if idle:
+                        _LOGGER.debug("client didn't send anything for {}s, ending the replayed connection".format(self.idle_timeout))
+                    if idle or (done and ((self.speed == 0) or (now - start >= duration / self.speed))):
+                        for update in updates:
+                            sock.sendall(update[2])
+                        updates = []
+                        ended = True
+                        # recorded responses that weren't used
+                        self.mismatches += sum(len(queue) - (1 if (cmd in used) else 0) for cmd, queue in replies.items())
+                        if not last:
+                            break
+                        # the last connection stays open until the client closes it, so its state isn't reset
+                        self.finished.set()
+                        continue
+                    wait = last_rx + self.idle_timeout - now
+                    if (len(updates) > 0) and (self.speed > 0) and (commands >= updates[0][1]):
+                        wait = min(wait, max(0, start + updates[0][0] / self.speed - now))
+                    if done:
+                        wait = min(wait, max(0, start + duration / self.speed - now))
+                if len(select.select([sock], [], [], wait)[0]) == 0:
+                    continue
+                data = sock.recv(4096)
+                if not data:
+                    raise OSError("client disconnected")
+                last_rx = time.monotonic()
+                received += data
+                end = received.rfind(b'$')
+                if end < 0:
+                    continue
+                for cmd in _commands(received[:end + 1]):
+                    commands += 1
+                    last_tx = self._reply(sock, cmd, replies, commands_by_key, used, last_rx, last_tx)
+                received = received[end + 1:]
+        except OSError as e:
+            _LOGGER.debug("replay connection closed: " + str(e))
+        finally:
+            sock.close()
+            if last:
+                self.finished.set()
+
+    def _reply(self, sock, cmd, replies, commands_by_key, used, received, last_tx):
+        # answer a command with the next recorded response, returns the time at which it was sent
+        queue = replies.get(cmd)
+        if queue is None:
+            self.mismatches += 1
+            recorded = commands_by_key.get(command_key(cmd))
+            if recorded is None:
+                _LOGGER.debug("no recorded response to " + str(cmd))
+                sock.sendall(b'^!$\r\n')
+                return last_tx
+            _LOGGER.debug("{} wasn't recorded, answering it like {}".format(cmd, recorded))
+            queue = replies[recorded]
+            latency, data = queue[-1]
+        else:
+            used.add(cmd)
+            latency, data = queue.popleft() if (len(queue) > 1) else queue[0]
+        if self.speed > 0:
+            delay = max(last_tx, received + latency / self.speed) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        sock.sendall(data)
+        return time.monotonic()
+
+def _commands(data):
+    # the ^...$ commands in data that was sent by a client
+    return [cmd.strip() + b'$' for cmd in bytes(data).split(b'$')[:-1]]
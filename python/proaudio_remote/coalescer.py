@@ -0,0 +1,62 @@
+import threading
+import time
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+class WriteCoalescer():
+    """ Collects writes to zone values until they're flushed, keeping only the last value that was
+        written to each (zone, attribute). Flushes are at least flush_interval seconds apart, which
+        bounds the number of commands sent to the switch no matter how fast values are written. """
+    def __init__(self, flush_interval:float=0.2):
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._pending = {}
+        self._scheduled = False
+        # time.time() at which the queued writes have to be flushed, None if nothing is queued
+        self._due = None
+        self._last_flush = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, value, new_value, cmd):
+        """ queue cmd, the command that writes new_value to the ZoneValue value.
+            returns the number of seconds after which flush() has to be called, or None if a flush is already scheduled """
+        with self._lock:
+            key = value.key
+            if key in self._pending:
+                # replaced before it was sent
+                self.dropped += 1
+            self._pending[key] = (value, new_value, cmd)
+            if self._scheduled:
+                return None
+            self._scheduled = True
+            now = time.time()
+            self._due = max(now, self._last_flush + self.flush_interval)
+            return self._due - now
+
+    def next_flush(self):
+        """ seconds until flush() has to be called, or None if no writes are queued """
+        due = self._due
+        return None if (due is None) else max(0, due - time.time())
+
+    def pending(self, value):
+        """ True if a write to value is waiting to be sent """
+        return (len(self._pending) > 0) and (value.key in self._pending)
+
+    def take(self):
+        """ remove and return the queued writes as (value, new value, command) """
+        with self._lock:
+            rv = list(self._pending.values())
+            self._pending = {}
+            self._scheduled = False
+            self._due = None
+            self._last_flush = time.time()
+        return rv
+
+    def clear(self):
+        with self._lock:
+            self._pending = {}
+            self._scheduled = False
+            self._due = None
@@ -0,0 +1,68 @@
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+# encoded values 0-255 as int and as string, which covers all volume, eq, bass, treble and zone values
+_SMALL_INTS = tuple(str(value).encode() for value in range(256))
+_SMALL_STRS = dict((str(value), _SMALL_INTS[value]) for value in range(256))
+
+def query_command(cmd, zonefmt):
+    """ command that reads a zone value, like b"^VPZ @001?$" """
+    return "^{} @{}?$".format(cmd, zonefmt).encode()
+
+def command_prefix(cmd, zonefmt):
+    """ start of the command that changes a zone value, like b"^VPZ @001," """
+    return "^{} @{},".format(cmd, zonefmt).encode()
+
+def value_bytes(value):
+    """ encode a command value """
+    if (type(value) is int) and (0 <= value < 256):
+        return _SMALL_INTS[value]
+    if type(value) is str:
+        rv = _SMALL_STRS.get(value)
+        return rv if (rv is not None) else value.encode()
+    if type(value) is bytes:
+        return value
+    return str(value).encode()
+
+def build_command(prefix, value):
+    """ command that changes a zone value, from the prefix returned by command_prefix() """
+    return prefix + value_bytes(value) + b'$'
+
+class SendBuffer():
+    """ reusable buffer that commands are collected in before they're sent to the switch.
+        it only grows, so sending a burst of commands doesn't allocate a new buffer """
+    def __init__(self, size=4096):
+        self._buf = bytearray(size)
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def clear(self):
+        self._len = 0
+
+    def write(self, data):
+        self.write_all((data,))
+
+    def write_all(self, chunks):
+        """ append all chunks (bytes) to the buffer """
+        buf = self._buf
+        pos = self._len
+        for data in chunks:
+            end = pos + len(data)
+            if end > len(buf):
+                buf = self._grow(pos, end)
+            buf[pos:end] = data
+            pos = end
+        self._len = pos
+
+    def _grow(self, pos, size):
+        # a new buffer instead of resizing, views of the old one may still exist
+        buf = bytearray(max(size, 2 * len(self._buf)))
+        buf[:pos] = self._buf[:pos]
+        self._buf = buf
+        return buf
+
+    def view(self):
+        """ memoryview of the data in the buffer, only valid until the next write() """
+        return memoryview(self._buf)[:self._len]
@@ -1,9 +1,17 @@
+from collections import deque
 import logging
+import select
 import socket
 import _thread as thread
+import concurrent.futures
 import threading
 import time
 from .response import *
+from .pipeline import *
+from .framer import *
+from .commands import *
+from .metrics import *
+from .capture import *
 
 _LOGGER = logging.getLogger(__name__)
 #_LOGGER.setLevel(logging.DEBUG)
@@ -21,14 +29,37 @@ class ConnectionCallback():
     def poll(self):
         pass
 
+    def next_poll(self):
+        # seconds until poll() has to be called again
+        return 1
+
 class Connection():
-    def __init__(self, callback:ConnectionCallback, target_ip:str):
+    """ recorder:        CaptureRecorder that records all traffic, see capture.py
+        transport:       object with connect(target_ip, port, timeout) that returns a socket, like ReplayTransport.
+                         a TCP connection to the switch is used if it's not set
+        command_timeout: seconds that a batch of commands may take if no timeout is passed, plus the time
+                         to send the batch through a full pipeline. commands that take longer fail with CommandTimeout """
+    def __init__(self, callback:ConnectionCallback, target_ip:str, port:int=50005, pipeline_depth:int=16,
+                 recorder:CaptureRecorder=None, transport=None, command_timeout:float=5):
         self._target_ip = target_ip
+        self._port = port
         self._callback = callback
+        self._transport = transport
         self._socket = None
+        self.recorder = recorder
+        self.command_timeout = command_timeout
+        self.metrics = Metrics()
+        self._pipeline = CommandPipeline(pipeline_depth, self.metrics)
+        self._rx = FrameBuffer()
+        self._tx = SendBuffer()
         self._last_connect = 0
         self._stop = False
         self._lock = threading.RLock()
+        # commands that were submitted by other threads, see submit_threadsafe()
+        self._incoming = deque()
+        self._wakeup = socket.socketpair()
+        for sock in self._wakeup:
+            sock.setblocking(False)
         thread.start_new_thread(self._run, ())
 
     @property
@@ -37,47 +68,160 @@ class Connection():
 
     @property
     def connected(self):
-        with self._lock:
-            return (self._socket is not None)
+        # not locked, so it doesn't wait for commands that are being sent by another thread
+        return (self._socket is not None)
 
     def close(self):
         self._stop = True
         with self._lock:
+            self._pipeline.fail_all(Exception('connection closed'))
             if self._socket is not None:
                 self._socket.close()
                 self._socket = None
+                self._record(DISCONNECT)
+            if self.recorder is not None:
+                self.recorder.close()
+
+    def send_command(self, cmd, key=None, timeout:float=None):
+        """ send a command and return its response. raises CommandTimeout if there's no response within timeout seconds """
+        return self.send_many([cmd], [key], timeout)[0].result()
+
+    def deadline(self, timeout:float=None, count:int=1):
+        """ time.perf_counter() by which a batch of count commands has to be answered """
+        if timeout is None:
+            timeout = self.command_timeout + count / self._pipeline.depth
+        return time.perf_counter() + timeout
+
+    def submit(self, cmd, key=None, deadline=None):
+        """ queue a command without waiting for it. it's sent by the next send_many(), flush() or poll.
+            the future can be cancelled while the command wasn't sent. see deadline() for the default deadline """
+        if deadline is None:
+            deadline = self.deadline()
+        return self._pipeline.submit(cmd, concurrent.futures.Future(), key, deadline).future
+
+    def submit_threadsafe(self, cmd, key=None, deadline=None):
+        """ queue a command from any thread or event loop without waiting for the connection lock.
+            the connection thread is woken up to send it, returns a future that is resolved with the response """
+        future = concurrent.futures.Future()
+        if self._socket is None:
+            future.set_exception(Exception('not connected'))
+            return future
+        self._incoming.append((cmd, future, key, deadline))
+        self.wakeup()
+        return future
+
+    def wakeup(self):
+        """ wake up the connection thread, which sends the submitted commands and polls again """
+        try:
+            self._wakeup[1].send(b'\0')
+        except OSError:
+            # the connection thread will be woken up by the data that's already in the socket
+            pass
+
+    def send_many(self, cmds, keys=None, timeout:float=None):
+        """ send a batch of commands, keeping multiple commands in flight. returns a future per command.
+            keys are the (command, zone) of the commands, they're parsed from the commands if not given.
+            commands that weren't answered within timeout seconds, including the time waiting for other
+            threads to finish their commands, fail with CommandTimeout. see deadline() for the default """
+        start = time.perf_counter()
+        deadline = self.deadline(timeout, len(cmds))
+        if not self._lock.acquire(timeout=max(0, deadline - start)):
+            self.metrics.timeouts += 1
+            raise CommandTimeout("connection busy")
+        try:
+            self.metrics.lock_wait.observe(time.perf_counter() - start)
+            if self.connection() is None:
+                raise Exception('not connected')
+            if keys is None:
+                keys = [None] * len(cmds)
+            futures = [self.submit(cmd, key, deadline) for cmd, key in zip(cmds, keys)]
+            self._pump(futures)
+        finally:
+            self._lock.release()
+        return futures
+
+    def cancel_queued(self):
+        """ cancel the commands that weren't sent yet, returns the number of commands.
+            it doesn't wait for the lock, so commands that are queued behind a batch of another thread are cancelled """
+        rv = 0
+        for cmd, future, key, deadline in list(self._incoming):
+            if cancel_command(cmd, future):
+                rv += 1
+        return rv + self._pipeline.cancel_queued()
+
+    def flush(self):
+        """ send all queued commands and wait for their responses. late responses to commands that already
+            failed are read by the connection thread """
+        self._pump([])
 
-    def send_command(self, cmd):
-        rv = None
+    def _take_incoming(self):
+        # move commands that were submitted by other threads into the pipeline
+        while len(self._incoming) > 0:
+            cmd, future, key, deadline = self._incoming.popleft()
+            self._pipeline.submit(cmd, future, key, deadline if (deadline is not None) else self.deadline())
+
+    def _pump(self, futures):
         with self._lock:
-            con = self.connection()
+            self._take_incoming()
+            self._pipeline.expire()
+            if not self._pipeline.waiting:
+                return
+            con = self._socket
             if con is None:
-                raise Exception('not connected')
+                self._pipeline.fail_all(Exception('not connected'))
+                return
             try:
-                _LOGGER.debug('tx: ' + str(cmd))
-                con.sendall(cmd.encode())
-                return self._read_response(cmd)
+                while self._pipeline.waiting:
+                    self._take_incoming()
+                    pending = self._pipeline.next_to_send()
+                    if len(pending) > 0:
+                        self._tx.clear()
+                        self._tx.write_all([p.cmd for p in pending])
+                        if _LOGGER.isEnabledFor(logging.DEBUG):
+                            _LOGGER.debug('tx: ' + str(bytes(self._tx.view())))
+                        con.sendall(self._tx.view())
+                        self.metrics.bytes_sent += len(self._tx)
+                        self._record(TX, self._tx.view())
+                    if all(f.done() for f in futures) and (len(futures) > 0):
+                        break
+                    if not self._wait_for_data(self._pipeline.next_deadline()):
+                        self._pipeline.expire()
+                        continue
+                    self._read_response()
             except Exception as e:
+                self.metrics.errors += 1
+                if isinstance(e, socket.timeout):
+                    self.metrics.timeouts += 1
+                self._pipeline.fail_all(e)
                 if self._socket is not None:
                     self._socket.close()
                     self._socket = None
+                    self._rx.clear()
+                    self.metrics.disconnects += 1
+                    self._record(DISCONNECT)
                     self._callback.on_connection_lost()
-                raise e
-
-    def _read_response(self, cmd):
-        cnt = 0
-        while cnt < 5:
-            cnt = cnt + 1
-            resp_data = self._socket.recv(1024)
-            if resp_data is None:
-                raise Exception('command timed out')
-            _LOGGER.debug('rx: ' + str(resp_data))
-            try:
-                return CommandResponse(cmd, resp_data)
-            except Exception as e:
+
+    def _wait_for_data(self, deadline):
+        # wait until data can be read or the deadline expires, returns False at the deadline. recv() is only
+        # called when there's data, so commands fail with CommandTimeout instead of the socket's timeout
+        if deadline is None:
+            deadline = self.deadline()
+        remaining = max(0, deadline - time.perf_counter())
+        return len(select.select([self._socket], [], [], remaining)[0]) > 0
+
+    def _read_response(self):
+        nb = self._rx.recv_into(self._socket)
+        if nb == 0:
+            raise ConnectionError('connection closed')
+        self.metrics.bytes_received += nb
+        self._record(RX, self._rx.last(nb))
+        for frame in self._rx.frames():
+            if _LOGGER.isEnabledFor(logging.DEBUG):
+                _LOGGER.debug('rx: ' + str(bytes(frame)))
+            if not self._pipeline.process_frame(frame):
                 # process update
-                self._callback.on_update(resp_data)
-        return None
+                self.metrics.updates += 1
+                self._callback.on_update(bytes(frame))
 
     def connection(self):
         connected = False
@@ -85,10 +229,16 @@ class Connection():
         if (self._socket is None) and ((now - self._last_connect) >= 10):
             self._last_connect = now
             try:
-                self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self._socket.settimeout(1)
-                self._socket.connect((self._target_ip, 50005))
+                self._rx.clear()
+                if self._transport is not None:
+                    self._socket = self._transport.connect(self._target_ip, self._port, 1)
+                else:
+                    self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    self._socket.settimeout(1)
+                    self._socket.connect((self._target_ip, self._port))
                 connected = True
+                self.metrics.connects += 1
+                self._record(CONNECT)
                 _LOGGER.debug("connected to " + str(self._target_ip))
             except Exception as e:
                 self._socket = None
@@ -103,6 +253,7 @@ class Connection():
                 if self._socket is not None:
                     self._socket.close()
                     self._socket = None
+                    self._record(DISCONNECT)
                     self._callback.on_connection_lost()
                     raise e
         return self._socket
@@ -113,9 +264,60 @@ class Connection():
             try:
                 if self.connection() is not None:
                     self._callback.poll()
-            except Exception:
+                    self.flush()
+                    self._process_updates(self._callback.next_poll())
+                else:
+                    # fail commands that were submitted while disconnected
+                    self.flush()
+                    time.sleep(1)
+            except CommandError as e:
+                # commands of the poll failed, for example because a batch of another thread holds the connection.
+                # only socket errors drop the connection
+                _LOGGER.debug("poll failed: " + str(e))
+                time.sleep(1)
+            except OSError:
                 if self._socket is not None:
                     self._socket.close()
                     self._socket = None
+                    self.metrics.disconnects += 1
+                    self._record(DISCONNECT)
                     self._callback.on_connection_lost()
-            time.sleep(1)
+                time.sleep(1)
+            except Exception as e:
+                _LOGGER.error("poll failed: " + str(e))
+                time.sleep(1)
+        for sock in self._wakeup:
+            sock.close()
+
+    def _record(self, direction, data=b''):
+        if self.recorder is not None:
+            self.recorder.record(direction, data)
+
+    def _process_updates(self, timeout):
+        # read unsolicited updates from the switch until the timeout expires, without holding the lock while idle
+        end = time.time() + timeout
+        while not self._stop:
+            remaining = end - time.time()
+            sock = self._socket
+            if (remaining <= 0) or (sock is None):
+                return
+            readable = select.select([sock, self._wakeup[0]], [], [], remaining)[0]
+            if len(readable) == 0:
+                return
+            if self._wakeup[0] in readable:
+                # the commands that were submitted are sent by the next poll cycle
+                self._drain_wakeup()
+                return
+            if sock not in readable:
+                continue
+            with self._lock:
+                # another thread may have read the data in the mean time
+                if (self._socket is sock) and (len(select.select([sock], [], [], 0)[0]) > 0):
+                    self._read_response()
+
+    def _drain_wakeup(self):
+        try:
+            while len(self._wakeup[0].recv(4096)) > 0:
+                pass
+        except OSError:
+            pass
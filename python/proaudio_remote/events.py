@@ -0,0 +1,36 @@
+from collections import namedtuple
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+# a value of a zone was changed, by the switch or by a setter. old is the value before the first change
+# since the last poll cycle, new the current value and timestamp the time of the last change
+ChangeEvent = namedtuple('ChangeEvent', ('zone', 'attribute', 'old', 'new', 'timestamp'))
+
+class ChangeSubscribers():
+    """ Callbacks that receive the ChangeEvents of a poll cycle in one list, optionally only the events of some attributes.
+        The list of subscribers is replaced when it's changed, so subscribing from another thread is safe. """
+    def __init__(self):
+        self._subscribers = []
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, callback, attributes=None):
+        """ call callback(events) with the changes of every poll cycle, only with the changes of attributes
+            (like "volume" or "eq1") if given. returns a function that removes the subscription """
+        entry = (callback, frozenset(attributes) if (attributes is not None) else None)
+        self._subscribers = self._subscribers + [entry]
+
+        def unsubscribe():
+            self._subscribers = [s for s in self._subscribers if s is not entry]
+        return unsubscribe
+
+    def dispatch(self, events):
+        for callback, attributes in self._subscribers:
+            selected = events if (attributes is None) else [event for event in events if event.attribute in attributes]
+            if len(selected) == 0:
+                continue
+            try:
+                callback(selected)
+            except Exception as e:
+                _LOGGER.error("change callback failed: " + str(e))
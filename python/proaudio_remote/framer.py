@@ -0,0 +1,78 @@
+import logging
+import re
+
+_LOGGER = logging.getLogger(__name__)
+
+# a frame starts with the last ^ before the next $ and ends with that $. data outside of frames (\r\n) is skipped
+_FRAME = re.compile(rb'\^[^^$]*\$')
+
+class FrameBuffer():
+    """ Incremental framer for the ^...$ protocol.
+        Received data is written into a persistent buffer and complete frames are returned as memoryviews
+        into that buffer, so a frame is only valid until the next call to recv_into() or feed().
+        Incomplete frames stay in the buffer until the rest is received. """
+    def __init__(self, size:int=4096):
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        """ number of buffered bytes that aren't part of a returned frame yet """
+        return self._end - self._start
+
+    def clear(self):
+        self._start = 0
+        self._end = 0
+
+    def recv_into(self, sock):
+        """ receive data from a socket directly into the buffer. returns the number of bytes received """
+        self._reserve(1024)
+        nb = sock.recv_into(self._view[self._end:])
+        self._end += nb
+        return nb
+
+    def last(self, nb):
+        """ the last nb bytes that were received, until the next call to frames() """
+        return self._view[self._end - nb:self._end]
+
+    def feed(self, data):
+        """ append received data to the buffer """
+        nb = len(data)
+        self._reserve(nb)
+        self._view[self._end:self._end + nb] = data
+        self._end += nb
+
+    def frames(self):
+        """ all complete frames in the buffer """
+        rv = []
+        view = self._view
+        pos = self._start
+        for match in _FRAME.finditer(self._buf, pos, self._end):
+            start, pos = match.span()
+            rv.append(view[start:pos])
+        if pos == self._end:
+            # everything was consumed, start at the front of the buffer again
+            pos = 0
+            self._end = 0
+        self._start = pos
+        return rv
+
+    def _reserve(self, nb):
+        # make room for nb bytes at the end of the buffer
+        if self._end + nb <= len(self._buf):
+            return
+        pending = self._end - self._start
+        if pending + nb <= len(self._buf):
+            # move the incomplete frame to the front of the buffer
+            self._buf[0:pending] = self._buf[self._start:self._end]
+        else:
+            size = len(self._buf)
+            while size < pending + nb:
+                size *= 2
+            buf = bytearray(size)
+            buf[0:pending] = self._view[self._start:self._end]
+            self._buf = buf
+            self._view = memoryview(buf)
+        self._start = 0
+        self._end = pending
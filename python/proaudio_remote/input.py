@@ -9,8 +9,8 @@ class AudioZoneInput(AudioZone):
 
     def __init__(self, nb, conn):
         super().__init__(nb, conn)
-        self._gain = self.register_value(ZoneValue('gain', self._refresh_gain, refresh_time=0))
-        self._delay = self.register_value(ZoneValue('delay', self._refresh_delay, refresh_time=0))
+        self._gain = self.register_value(ZoneValue('gain', 'GAI', decode_int, refresh_time=0))
+        self._delay = self.register_value(ZoneValue('delay', 'LSI', decode_int, refresh_time=0))
 
     @property
     def delay(self):
@@ -18,10 +18,7 @@ class AudioZoneInput(AudioZone):
 
     @delay.setter
     def delay(self, delay):
-        cmd = "^LSI @{},{}$".format(self.zonefmt, str(delay))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._delay.set(delay)
+        self._delay.write(delay)
 
     @property
     def gain(self):
@@ -29,91 +26,78 @@ class AudioZoneInput(AudioZone):
 
     @gain.setter
     def gain(self, gain):
-        data = "^GAI @{},{}$".format(str(self), str(gain))
-        rv = self._conn.send_command(data).zone_resp()
-        if rv is not None:
-            self._gain.set(gain)
-
-    def _refresh_gain(self):
-        data = "^GAI @{}?$".format(str(self))
-        return self._conn.send_command(data).zone_resp()
-
-    def _refresh_delay(self):
-        cmd = "^LSI @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
+        self._gain.write(gain)
 
 class AudioZoneAnalogIn(AudioZoneInput):
+    # Analog audio input, 1 based
+    _zone_name = "analog input {}"
+
     def __init__(self, nb, conn=None):
-        # Analog audio input, 1 based
         super().__init__(nb, conn)
 
     @property
     def is_analog(self):
         return True
 
-    def __repr__(self):
-        return "analog input {}".format(str(self._nb))
-
 class AudioZoneAnalogCoaxIn(AudioZoneInput):
+    # PCM from coax input, 1 based
+    # only PCM can be converted to analog
+    _zone_offset = 32
+    _zone_name = "PCM coax input {}"
+
     def __init__(self, nb, conn=None):
-        # PCM from coax input, 1 based
-        # only PCM can be converted to analog
-        super().__init__(nb + 32, conn)
+        super().__init__(nb, conn)
 
     @property
     def is_analog(self):
         return True
 
-    def __repr__(self):
-        return "PCM coax input {}".format(str(self._nb - 32))
-
 class AudioZoneAnalogOpticalIn(AudioZoneInput):
+    # PCM from optical input, 1 based
+    # only PCM can be converted to analog
+    _zone_offset = 64
+    _zone_name = "PCM optical input {}"
+
     def __init__(self, nb, conn=None):
-        # PCM from optical input, 1 based
-        # only PCM can be converted to analog
-        super().__init__(nb + 64, conn)
+        super().__init__(nb, conn)
 
     @property
     def is_analog(self):
         return True
 
-    def __repr__(self):
-        return "PCM optical input {}".format(str(self._nb - 64))
-
 class AudioZoneDigitalCoaxIn(AudioZoneInput):
+    # PCM, Dolby or DTS from coax input, 1 based
+    _zone_offset = 32
+    _zone_name = "digital coax input {}"
+
     def __init__(self, nb, conn=None):
-        # PCM, Dolby or DTS from coax input, 1 based
-        super().__init__(nb + 32, conn)
+        super().__init__(nb, conn)
 
     @property
     def is_digital(self):
         return True
 
-    def __repr__(self):
-        return "digital coax input {}".format(str(self._nb - 32))
-
 class AudioZoneDigitalOpticalIn(AudioZoneInput):
+    # PCM, Dolby or DTS from optical input, 1 based
+    _zone_offset = 64
+    _zone_name = "digital optical input {}"
+
     def __init__(self, nb, conn=None):
-        # PCM, Dolby or DTS from optical input, 1 based
-        super().__init__(nb + 64, conn)
+        super().__init__(nb, conn)
 
     @property
     def is_digital(self):
         return True
 
-    def __repr__(self):
-        return "digital optical input {}".format(str(self._nb - 64))
-
 class AudioZoneDigitalAnalogMirrorIn(AudioZoneInput):
+    # PCM input that mirrors analog outputs on the same card, 1 based
+    # only PCM can be converted to analog
+    _zone_offset = 128
+    _zone_name = "PCM mirror input {}"
+
     def __init__(self, nb, conn=None):
-        # PCM input that mirrors analog outputs on the same card, 1 based
-        # only PCM can be converted to analog
-        super().__init__(nb + 128, conn)
+        super().__init__(nb, conn)
 
     @property
     def is_analog(self):
         return True
-
-    def __repr__(self):
-        return "PCM mirror input {}".format(str(self._nb - 128))
-
@@ -0,0 +1,150 @@
+import asyncio
+import time
+import logging
+from .proaudio import *
+_LOGGER = logging.getLogger(__name__)
+
+class RemoteManager():
+    """ Drives many switches from a single asyncio task. The values of all switches are polled from one
+        shared scheduler, so max_poll_rate limits the number of values polled per second for all of them.
+        A switch only costs a socket, its read task and a state table, there is no thread or poll loop per switch. """
+    def __init__(self, max_poll_rate:float=200, callbacks:RemoteCallbacks=None):
+        self._scheduler = PollScheduler(max_poll_rate)
+        self._callbacks = callbacks
+        self._remotes = {}
+        self._connecting = {}
+        # poll task per switch, and the values that it polls next
+        self._polling = {}
+        self._waiting = {}
+        self._task = None
+        self._stop = False
+        self.polls = 0
+        self.polled_values = 0
+        self.poll_errors = 0
+        self.poll_time = 0
+
+    @property
+    def remotes(self):
+        """ all switches, by (address, port) """
+        return self._remotes
+
+    def add(self, target_ip:str, model:str=None, callbacks:RemoteCallbacks=None, write_interval:float=0.2, port:int=50005):
+        """ add a switch, returns its AsyncRemote. it's connected by the manager's task """
+        key = (target_ip, port)
+        if key in self._remotes:
+            return self._remotes[key]
+        remote = AsyncRemote(target_ip, model, callbacks if (callbacks is not None) else self._callbacks,
+                             write_interval=write_interval, scheduler=self._scheduler, port=port)
+        self._remotes[key] = remote
+        return remote
+
+    async def async_remove(self, target_ip:str, port:int=50005):
+        """ disconnect and remove a switch """
+        remote = self._remotes.pop((target_ip, port), None)
+        if remote is not None:
+            self._scheduler.remove(lambda val: val.zone._conn is remote)
+            self._waiting.pop(remote, None)
+            task = self._polling.pop(remote, None)
+            if task is not None:
+                task.cancel()
+            await remote.async_close()
+
+    def start(self):
+        """ start the task that connects to and polls all switches on the running event loop """
+        if self._task is None:
+            self._stop = False
+            self._task = asyncio.ensure_future(self._run())
+
+    async def async_close(self):
+        self._stop = True
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._connecting.values()) + list(self._polling.values()):
+            task.cancel()
+        self._connecting = {}
+        self._polling = {}
+        self._waiting = {}
+        for remote in self._remotes.values():
+            await remote.async_close()
+
+    def stats(self):
+        """ metrics of all switches """
+        return {
+            'remotes': len(self._remotes),
+            'connected': sum(1 for remote in self._remotes.values() if remote.connected),
+            'scheduled_values': len(self._scheduler),
+            'poll_lag': self._scheduler.lag,
+            'max_poll_lag': self._scheduler.max_lag,
+            'polls': self.polls,
+            'polled_values': self.polled_values,
+            'poll_errors': self.poll_errors,
+            'poll_time': self.poll_time,
+            'dropped_writes': sum(remote.dropped_writes for remote in self._remotes.values()),
+        }
+
+    async def _run(self):
+        _LOGGER.debug("remote manager running")
+        while not self._stop:
+            try:
+                self._connect()
+                self._poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _LOGGER.warning("poll failed: " + str(e))
+            due = self._scheduler.next_due()
+            # check the connections at least once per second
+            await asyncio.sleep(1 if (due is None) else min(1, due))
+
+    def _connect(self):
+        # connect switches that aren't connected in the background, so a switch that's down doesn't delay the others
+        for key, remote in self._remotes.items():
+            if remote.connected or (key in self._connecting):
+                continue
+            task = asyncio.ensure_future(remote.async_connect())
+            self._connecting[key] = task
+            task.add_done_callback(lambda task, key=key: self._connected(key, task))
+
+    def _connected(self, key, task):
+        self._connecting.pop(key, None)
+        if not task.cancelled() and (task.exception() is not None):
+            _LOGGER.debug("failed to connect to {}:{}: {}".format(key[0], key[1], str(task.exception())))
+
+    def _poll(self):
+        values = self._scheduler.pop_due()
+        # values of switches that are disconnected are dropped, they're scheduled again when it's reconnected
+        for val in values:
+            remote = val.zone._conn
+            if remote.connected:
+                self._waiting.setdefault(remote, []).append(val)
+        # values of new zones and switches that were connected aren't limited by max_poll_rate
+        for remote in self._remotes.values():
+            if remote.connected:
+                burst = remote._take_burst()
+                if len(burst) > 0:
+                    self._waiting.setdefault(remote, []).extend(burst)
+        # every switch is polled by its own task, so a slow switch doesn't delay the others
+        for remote in self._waiting:
+            if remote not in self._polling:
+                self._polling[remote] = asyncio.ensure_future(self._poll_remote(remote))
+
+    async def _poll_remote(self, remote):
+        try:
+            # values that became due while the switch was polled are polled next
+            while remote in self._waiting:
+                values = self._waiting.pop(remote)
+                start = time.time()
+                try:
+                    await remote.async_poll_values(values)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.poll_errors += 1
+                    _LOGGER.debug("failed to poll {}: {}".format(remote.target_ip, str(e)))
+                self.poll_time = time.time() - start
+                self.polls += 1
+                self.polled_values += len(values)
+        finally:
+            if self._polling.get(remote) is asyncio.current_task():
+                del self._polling[remote]
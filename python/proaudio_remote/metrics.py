@@ -0,0 +1,110 @@
+from bisect import bisect_left
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+# upper bounds in seconds of the latency buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+class Histogram():
+    """ number of observed values per bucket, with their sum """
+    __slots__ = ('bounds', 'counts', 'count', 'sum')
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        # the last bucket is +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        """ {'count', 'sum', 'buckets': [(upper bound, cumulative count)]}, the last bound is +Inf """
+        buckets = []
+        total = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+class Metrics():
+    """ counters and latency histograms of a connection """
+    # counters that are reported by snapshot()
+    COUNTERS = ('commands', 'timeouts', 'parse_failures', 'errors', 'connects', 'disconnects', 'bytes_sent', 'bytes_received', 'updates')
+
+    def __init__(self):
+        self.commands = 0
+        self.timeouts = 0
+        self.parse_failures = 0
+        self.errors = 0
+        self.connects = 0
+        self.disconnects = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.updates = 0
+        self.latency = {}
+        self.poll_duration = Histogram()
+        self.lock_wait = Histogram()
+
+    def command(self, cmd, latency):
+        """ a response to cmd (like "VPZ") was received latency seconds after the command was sent """
+        self.commands += 1
+        histogram = self.latency.get(cmd)
+        if histogram is None:
+            histogram = Histogram()
+            self.latency[cmd] = histogram
+        histogram.observe(latency)
+
+    def snapshot(self):
+        """ copy of all metrics as dict """
+        rv = {}
+        for name in self.COUNTERS:
+            rv[name] = getattr(self, name)
+        rv['latency'] = dict((cmd, histogram.snapshot()) for cmd, histogram in list(self.latency.items()))
+        rv['poll_duration'] = self.poll_duration.snapshot()
+        rv['lock_wait'] = self.lock_wait.snapshot()
+        return rv
+
+def render_openmetrics(stats, prefix="proaudio", labels=None):
+    """ stats as returned by Remote.stats() in the OpenMetrics text format, that Prometheus can scrape """
+    labels = {} if (labels is None) else labels
+    lines = []
+
+    def _labels(extra=None):
+        values = dict(labels)
+        if extra is not None:
+            values.update(extra)
+        if len(values) == 0:
+            return ""
+        return "{" + ",".join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in values.items()) + "}"
+
+    def _histogram(name, histograms, label=None):
+        lines.append("# TYPE {} histogram".format(name))
+        lines.append("# UNIT {} seconds".format(name))
+        for key, histogram in histograms:
+            extra = {} if (label is None) else {label: key}
+            for bound, count in histogram['buckets']:
+                le = "+Inf" if (bound == float('inf')) else repr(float(bound))
+                lines.append("{}_bucket{} {}".format(name, _labels(dict(extra, le=le)), count))
+            lines.append("{}_count{} {}".format(name, _labels(extra), histogram['count']))
+            lines.append("{}_sum{} {}".format(name, _labels(extra), repr(float(histogram['sum']))))
+
+    for name in Metrics.COUNTERS:
+        if name in stats:
+            lines.append("# TYPE {}_{} counter".format(prefix, name))
+            lines.append("{}_{}_total{} {}".format(prefix, name, _labels(), stats[name]))
+    for name in ('connected', 'scheduled_values', 'poll_lag'):
+        if name in stats:
+            lines.append("# TYPE {}_{} gauge".format(prefix, name))
+            lines.append("{}_{}{} {}".format(prefix, name, _labels(), float(stats[name])))
+    if 'latency' in stats:
+        _histogram(prefix + "_command_latency_seconds", sorted(stats['latency'].items()), 'command')
+    if 'poll_duration' in stats:
+        _histogram(prefix + "_poll_duration_seconds", [(None, stats['poll_duration'])])
+    if 'lock_wait' in stats:
+        _histogram(prefix + "_lock_wait_seconds", [(None, stats['lock_wait'])])
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
@@ -13,34 +13,57 @@ def _zonefmt(conn, inp, digital, zone):
         return z.zonefmt
     return str(zone)
 
+def _decode_bool(value):
+    return value == '1'
+
+def _encode_bool(value):
+    return "1" if value else "0"
+
+def _eq_to_db(val):
+    val = decode_int(val)
+    if val is not None:
+        val = (val - 128) * 0.5
+    return val
+
+def _eq_round(value):
+    # the switch changes the equaliser in steps of 0.5 dB
+    return round(float(value) * 2) / 2
+
+def _eq_from_db(value):
+    return int(round(float(value) * 2)) + 128
+
+def _decode_audio_type(rv):
+    if rv == '1':
+        return "no input"
+    elif rv == '2':
+        return "PCM stereo"
+    elif rv == '3':
+        return "Encoded SPDIF"
+    return "unknown"
+
+# (value name, command) of the 5 equaliser bands
+_EQ_BANDS = tuple(('eq' + str(band), 'EQ{}Z'.format(band)) for band in range(1, 6))
+
 class AudioZoneOutput(AudioZone):
     def __init__(self, nb, conn):
         super().__init__(nb, conn)
-        self._volume = self.register_value(ZoneValue('volume', self._refresh_volume))
-        self._mute = self.register_value(ZoneValue('mute', self._refresh_mute))
-        self._bass = self.register_value(ZoneValue('bass', self._refresh_bass, refresh_time=0))
-        self._treble = self.register_value(ZoneValue('treble', self._refresh_treble, refresh_time=0))
-        self._mirror = self.register_value(ZoneValue('mirror', self._refresh_mirror, refresh_time=0))
-        self._delay = self.register_value(ZoneValue('delay', self._refresh_delay, refresh_time=0))
-        i = 1
+        self._volume = self.register_value(ZoneValue('volume', 'VPZ', decode_int))
+        self._mute = self.register_value(ZoneValue('mute', 'VMZ', _decode_bool, _encode_bool))
+        self._bass = self.register_value(ZoneValue('bass', 'BAZ', decode_int, refresh_time=0))
+        self._treble = self.register_value(ZoneValue('treble', 'TRZ', decode_int, refresh_time=0))
+        self._mirror = self.register_value(ZoneValue('mirror', 'LZ', encode=self._encode_mirror, refresh_time=0))
+        self._delay = self.register_value(ZoneValue('delay', 'LSZ', decode_int, refresh_time=0))
         self._eq = []
-        while i < 6:
-            self._eq.append(self.register_value(ZoneValue('eq zone ' + str(i), self._refresh_eq, i, refresh_time=0)))
-            i = i + 1
+        for name, cmd in _EQ_BANDS:
+            self._eq.append(self.register_value(ZoneValue(name, cmd, _eq_to_db, _eq_from_db, refresh_time=0)))
 
     @property
     def volume(self):
-        volume = self._volume.get()
-        if volume is not None:
-            volume = int(volume)
-        return volume
+        return self._volume.get()
 
     @volume.setter
     def volume(self, volume):
-        cmd = "^VPZ @{},{}$".format(self.zonefmt, str(volume))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._volume.set(volume)
+        self._volume.write(volume)
 
     @property
     def muted(self):
@@ -48,14 +71,15 @@ class AudioZoneOutput(AudioZone):
 
     @muted.setter
     def muted(self, muted):
-        cmd = "^VMZ @{},{}$".format(self.zonefmt, "1" if muted else "0")
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._mute.set(muted)
+        self._mute.write(muted)
 
     def toggle_mute(self):
-        cmd = "^VMZ @{},+$".format(self.zonefmt)
-        rv = self._conn.send_command(cmd)
+        rv = self._conn.send_command(self._mute.command("+"), self._mute.key)
+        if rv is not None:
+            self._mute.reset()
+
+    async def async_toggle_mute(self):
+        rv = await self._conn.async_send_command(self._mute.command("+"), self._mute.key)
         if rv is not None:
             self._mute.reset()
 
@@ -65,10 +89,7 @@ class AudioZoneOutput(AudioZone):
 
     @bass.setter
     def bass(self, bass):
-        cmd = "^BAZ @{},{}$".format(self.zonefmt, str(bass))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._bass.set(bass)
+        self._bass.write(bass)
 
     @property
     def treble(self):
@@ -76,10 +97,7 @@ class AudioZoneOutput(AudioZone):
 
     @treble.setter
     def treble(self, treble):
-        cmd = "^TRZ @{},{}$".format(self.zonefmt, str(treble))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._treble.set(treble)
+        self._treble.write(treble)
 
     @property
     def mirror(self):
@@ -87,21 +105,15 @@ class AudioZoneOutput(AudioZone):
 
     @mirror.setter
     def mirror(self, mirror):
-        cmd = "^LZ @{},{}$".format(self.zonefmt, _zonefmt(self._conn, False, self.is_digital, mirror))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._mirror.set(mirror)
+        self._mirror.write(mirror)
 
     @property
     def delay(self):
-        return int(self._delay.get())
+        return self._delay.get()
 
     @delay.setter
     def delay(self, delay):
-        cmd = "^LSZ @{},{}$".format(self.zonefmt, str(delay))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._delay.set(delay)
+        self._delay.write(delay)
 
     @property
     def switch(self):
@@ -130,26 +142,52 @@ class AudioZoneOutput(AudioZone):
     @eq.setter
     def eq(self, values):
         # change all 5 equaliser values of an output
-        cnt = 0
-        while cnt < 5:
-            self.set_eq_band(cnt + 1, values[cnt])
-            cnt += 1
+        failed = self.apply_eq(values)
+        if len(failed) > 0:
+            raise Exception("failed to change equaliser bands {} of {}".format(failed, repr(self)))
+
+    def apply_eq(self, values):
+        """ change the equaliser bands (in dB, None to leave a band unchanged) that differ from the cached values
+            in one pipelined batch. returns the numbers of the bands that failed """
+        return self._conn.apply_eq([self], values).get(self, [])
+
+    async def async_apply_eq(self, values):
+        """ change the equaliser bands that differ from the cached values in one pipelined batch.
+            returns the numbers of the bands that failed """
+        return (await self._conn.async_apply_eq([self], values)).get(self, [])
+
+    def _eq_changes(self, values):
+        # (band, ZoneValue, value) of the bands that differ from the cached values
+        rv = []
+        band = 0
+        for val, value in zip(self._eq, values):
+            band += 1
+            if value is None:
+                continue
+            value = _eq_round(value)
+            if val.last_value != value:
+                rv.append((band, val, value))
+        return rv
 
     def get_eq_band(self, band):
+        # equaliser setting of a single band (1-5) in dB
         val = None
         if (int(band) >= 1 and int(band) <= 5):
             val = self._eq[int(band) - 1].get()
-        if val is not None:
-            val = (float(val) - 128) * 0.5
         return val
 
     def set_eq_band(self, band, value):
         # change the equaliser setting of a single band (1-5) of an output
-        value = (int(value) * 2) + 128
-        data = "^EQ{}Z @{},{}$".format(band, self.zonefmt, value)
-        rv = self._conn.send_command(data).zone_resp()
-        if rv is not None:
-            self._eq[int(band) - 1].set(value)
+        self._eq[int(band) - 1].write(_eq_round(value))
+
+    async def async_get_eq_band(self, band):
+        val = None
+        if (int(band) >= 1 and int(band) <= 5):
+            val = await self._eq[int(band) - 1].async_get()
+        return val
+
+    async def async_set_eq_band(self, band, value):
+        await self._eq[int(band) - 1].async_write(_eq_round(value))
 
     def set_eq_flat(self):
         self.eq = [0, 0, 0, 0, 0]
@@ -170,41 +208,20 @@ class AudioZoneOutput(AudioZone):
         #zi += "type: {}\n".format(str(self.audio_type))
         return zi
 
-    def _refresh_volume(self):
-        cmd = "^VPZ @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
-
-    def _refresh_mute(self):
-        cmd = "^VMZ @{}?$".format(self.zonefmt)
-        return (self._conn.send_command(cmd).zone_resp() == 1)
-
-    def _refresh_bass(self):
-        cmd = "^BAZ @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
-
-    def _refresh_treble(self):
-        cmd = "^TRZ @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
+    def _encode_mirror(self, mirror):
+        return _zonefmt(self._conn, False, self.is_digital, mirror)
 
-    def _refresh_mirror(self):
-        cmd = "^LZ @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
-
-    def _refresh_delay(self):
-        cmd = "^LSZ @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
-
-    def _refresh_eq(self, band):
-        # read the equaliser setting of a single band (1-5) of an output
-        data = "^EQ{}Z @{}?$".format(band, self.zonefmt)
-        return self._conn.send_command(data).zone_resp()
+    def _encode_source(self, source):
+        return _zonefmt(self._conn, True, self.is_digital, source)
 
 class AudioZoneAnalogOutput(AudioZoneOutput):
+    _zone_name = "analog output {}"
+
     def __init__(self, nb, conn=None):
         super().__init__(nb, conn)
-        self._switch = self.register_value(ZoneValue('switch', self._refresh_switch, refresh_time=0))
-        self._switch_delay = self.register_value(ZoneValue('switch delay', self._refresh_switch_delay, refresh_time=0))
-        self._audio_type = self.register_value(ZoneValue('audio type', self._refresh_audio_type))
+        self._switch = self.register_value(ZoneValue('switch', 'SZ', self._decode_switch, self._encode_source, refresh_time=0))
+        self._switch_delay = self.register_value(ZoneValue('switch_delay', 'DZ', decode_int, refresh_time=0))
+        self._audio_type = self.register_value(ZoneValue('audio_type', 'ATZ', _decode_audio_type))
 
     @property
     def is_analog(self):
@@ -214,28 +231,14 @@ class AudioZoneAnalogOutput(AudioZoneOutput):
     def audio_type(self):
         return self._audio_type.get()
 
-    def _refresh_audio_type(self):
-        cmd = "^ATZ @{}?$".format(self.zonefmt)
-        rv = self._conn.send_command(cmd).zone_resp()
-        if rv == 1:
-            return "no input"
-        elif rv == 2:
-            return "PCM stereo"
-        elif rv == 3:
-            return "Encoded SPDIF"
-        return "unknown"
-
     @property
     def switch(self):
         return self._switch.get()
 
     @switch.setter
     def switch(self, source):
-        cmd = "^SZ @{},{}$".format(self.zonefmt, _zonefmt(self._conn, True, self.is_digital, source))
-        _LOGGER.warning(">> {}".format(cmd))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._switch.set(source)
+        _LOGGER.warning(">> {}".format(self._switch.command(self._encode_source(source))))
+        self._switch.write(source)
 
     @property
     def switch_delay(self):
@@ -243,31 +246,22 @@ class AudioZoneAnalogOutput(AudioZoneOutput):
 
     @switch_delay.setter
     def switch_delay(self, delay):
-        cmd = "^DZ @{},{}$".format(self.zonefmt, str(delay))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._switch_delay.set(delay)
-
-    def _refresh_switch_delay(self):
-        cmd = "^DZ @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
+        self._switch_delay.write(delay)
 
     @property
     def sources(self):
         return self._conn.inputs
 
-    def _refresh_switch(self):
-        cmd = "^SZ @{}?$".format(self.zonefmt)
-        return self._conn.get_by_id(True, False, self._conn.send_command(cmd).zone_resp())
-
-    def __repr__(self):
-        return "analog output {}".format(str(self._nb))
+    def _decode_switch(self, rv):
+        return self._conn.get_by_id(True, False, rv)
 
 class AudioZoneDigitalOutput(AudioZoneOutput):
+    _zone_name = "digital output {}"
+
     def __init__(self, nb, conn=None):
         super().__init__(nb, conn)
-        self._switch = self.register_value(ZoneValue('switch', self._refresh_switch, refresh_time=0))
-        self._switch_delay = self.register_value(ZoneValue('switch delay', self._refresh_switch_delay, refresh_time=0))
+        self._switch = self.register_value(ZoneValue('switch', 'DSZ', self._decode_switch, self._encode_source, refresh_time=0))
+        self._switch_delay = self.register_value(ZoneValue('switch_delay', 'DDZ', decode_int, refresh_time=0))
 
     @property
     def is_digital(self):
@@ -279,11 +273,8 @@ class AudioZoneDigitalOutput(AudioZoneOutput):
 
     @switch.setter
     def switch(self, source):
-        cmd = "^DSZ @{},{}$".format(self.zonefmt, _zonefmt(self._conn, True, self.is_digital, source))
-        _LOGGER.info("set_switch({}) = {}".format(source, cmd))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._switch.set(source)
+        _LOGGER.info("set_switch({}) = {}".format(source, self._switch.command(self._encode_source(source))))
+        self._switch.write(source)
 
     @property
     def switch_delay(self):
@@ -291,23 +282,11 @@ class AudioZoneDigitalOutput(AudioZoneOutput):
 
     @switch_delay.setter
     def switch_delay(self, delay):
-        cmd = "^DDZ @{},{}$".format(self.zonefmt, str(delay))
-        rv = self._conn.send_command(cmd)
-        if rv is not None:
-            self._switch_delay.set(delay)
-
-    def _refresh_switch(self):
-        cmd = "^DSZ @{}?$".format(self.zonefmt)
-        return self._conn.get_by_id(True, True, self._conn.send_command(cmd).zone_resp())
+        self._switch_delay.write(delay)
 
-    def _refresh_switch_delay(self):
-        cmd = "^DDZ @{}?$".format(self.zonefmt)
-        return self._conn.send_command(cmd).zone_resp()
+    def _decode_switch(self, rv):
+        return self._conn.get_by_id(True, True, rv)
 
     @property
     def sources(self):
         return self._conn.inputs_digital
-
-    def __repr__(self):
-        return "digital output {}".format(str(self._nb))
-
@@ -0,0 +1,181 @@
+from collections import deque
+import logging
+import time
+from .response import *
+
+_LOGGER = logging.getLogger(__name__)
+
+ACK_FRAME = b'^+$'
+# returned by the switch instead of ^+$ when it rejects a command
+ERROR_FRAME = b'^!$'
+
+class CommandError(Exception):
+    """ a command failed """
+
+class CommandTimeout(CommandError, TimeoutError):
+    """ no response to a command was received before its deadline """
+
+class CommandRejected(CommandError):
+    """ the switch returned an error for a command """
+
+class CommandCancelled(CommandError):
+    """ a command was cancelled before it was sent """
+
+def cancel_command(cmd, future):
+    """ fail the future of a command that wasn't sent with CommandCancelled. returns False if it was already
+        resolved, which may happen on another thread at the same time """
+    if future.done():
+        return False
+    try:
+        future.set_exception(CommandCancelled("{} was cancelled".format(cmd)))
+    except Exception:
+        return False
+    return True
+
+class PendingCommand():
+    """ command that was submitted to the switch, resolved by the future once its response is received.
+        deadline is the time.perf_counter() after which it fails with CommandTimeout, None to wait for the connection """
+    def __init__(self, cmd, future, key=None, deadline=None):
+        self.cmd = cmd.encode() if isinstance(cmd, str) else cmd
+        self.future = future
+        self.key = key if (key is not None) else command_key(cmd)
+        self.deadline = deadline
+        self.acked = False
+        self.sent = None
+
+class CommandPipeline():
+    """ keeps up to `depth` commands in flight and matches each response to its command by command and zone.
+        commands that were sent but failed, like after their deadline, stay in flight for `grace` seconds
+        so a late response isn't matched to another command """
+    def __init__(self, depth=16, metrics=None, grace:float=2):
+        self.depth = depth
+        self.metrics = metrics
+        self.grace = grace
+        self._queued = deque()
+        self._inflight = deque()
+
+    @property
+    def busy(self):
+        """ True if commands are queued or waiting for a response """
+        return (len(self._queued) > 0) or (len(self._inflight) > 0)
+
+    @property
+    def waiting(self):
+        """ True if commands are queued or in flight that weren't resolved yet """
+        for queue in (self._inflight, self._queued):
+            for pending in queue:
+                if not pending.future.done():
+                    return True
+        return False
+
+    @property
+    def inflight(self):
+        return len(self._inflight)
+
+    def submit(self, cmd, future, key=None, deadline=None):
+        """ queue a command (str or bytes). key is its (command, zone), it's parsed from the command if it isn't given """
+        pending = PendingCommand(cmd, future, key, deadline)
+        self._queued.append(pending)
+        return pending
+
+    def next_deadline(self):
+        """ the earliest deadline of the commands that weren't resolved yet, or None """
+        rv = None
+        for queue in (self._inflight, self._queued):
+            for pending in queue:
+                if (pending.deadline is not None) and ((rv is None) or (pending.deadline < rv)) and not pending.future.done():
+                    rv = pending.deadline
+        return rv
+
+    def expire(self, now=None):
+        """ fail the commands whose deadline passed with CommandTimeout, and stop waiting for the response to
+            commands in flight that failed more than `grace` seconds ago. returns the number of commands that failed """
+        if now is None:
+            now = time.perf_counter()
+        rv = 0
+        for queue in (self._inflight, self._queued):
+            for pending in queue:
+                if (pending.deadline is not None) and (pending.deadline <= now) and not pending.future.done():
+                    pending.future.set_exception(CommandTimeout("no response to {} before its deadline".format(bytes(pending.cmd))))
+                    rv += 1
+        if (rv > 0) and (self.metrics is not None):
+            self.metrics.timeouts += rv
+        if any(self._abandoned(pending, now) for pending in self._inflight):
+            _LOGGER.debug("no late response to {} commands".format(sum(self._abandoned(pending, now) for pending in self._inflight)))
+            self._inflight = deque(pending for pending in self._inflight if not self._abandoned(pending, now))
+        return rv
+
+    def _abandoned(self, pending, now):
+        # a command in flight that failed, without response for grace seconds after its deadline
+        if not pending.future.done():
+            return False
+        failed = pending.deadline if (pending.deadline is not None) else pending.sent
+        return failed + self.grace <= now
+
+    def cancel_queued(self):
+        """ fail all commands that weren't sent yet with CommandCancelled, returns the number of commands.
+            they're dropped by next_to_send(), so another thread may be sending commands in the mean time """
+        rv = 0
+        for pending in list(self._queued):
+            if cancel_command(pending.cmd, pending.future):
+                rv += 1
+        return rv
+
+    def next_to_send(self):
+        """ move queued commands in flight while the window allows, returns the commands to send """
+        rv = []
+        now = time.perf_counter()
+        while (len(self._inflight) < self.depth) and (len(self._queued) > 0):
+            pending = self._queued.popleft()
+            if pending.future.done():
+                # cancelled before it was sent
+                continue
+            pending.sent = now
+            self._inflight.append(pending)
+            rv.append(pending)
+        return rv
+
+    def process_frame(self, frame):
+        """ match a received frame (bytes or memoryview) to a command in flight.
+            returns False if it wasn't a response to any of them """
+        if frame == ACK_FRAME:
+            for pending in self._inflight:
+                if not pending.acked:
+                    pending.acked = True
+                    return True
+            return False
+        if frame == ERROR_FRAME:
+            # the switch doesn't send a response after an error
+            for pending in self._inflight:
+                if not pending.acked:
+                    self._inflight.remove(pending)
+                    if not pending.future.done():
+                        pending.future.set_exception(CommandRejected("{} was rejected by the switch".format(bytes(pending.cmd))))
+                    return True
+            return False
+        parsed = parse_response(frame)
+        if parsed is None:
+            if self.metrics is not None:
+                self.metrics.parse_failures += 1
+            return False
+        key = parsed[0]
+        for pending in self._inflight:
+            if pending.acked and (pending.key == key):
+                self._inflight.remove(pending)
+                if self.metrics is not None:
+                    self.metrics.command(key[0], time.perf_counter() - pending.sent)
+                if not pending.future.done():
+                    pending.future.set_result(CommandResponse(pending.cmd, parsed[2], parsed[1]))
+                return True
+        return False
+
+    def fail_all(self, exc):
+        """ fail all queued and in flight commands, after the connection was lost """
+        while len(self._inflight) > 0:
+            pending = self._inflight.popleft()
+            if not pending.future.done():
+                pending.future.set_exception(exc)
+        while len(self._queued) > 0:
+            pending = self._queued.popleft()
+            if not pending.future.done():
+                pending.future.set_exception(exc)
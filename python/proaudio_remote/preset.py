@@ -0,0 +1,121 @@
+import logging
+from .zone import *
+_LOGGER = logging.getLogger(__name__)
+
+# values of an output that are stored in a preset
+PRESET_VALUES = ('mute', 'switch', 'switch_delay', 'volume', 'bass', 'treble', 'delay', 'eq1', 'eq2', 'eq3', 'eq4', 'eq5')
+# values that route audio to an output, the output is muted while they're changed
+_ROUTING_VALUES = ('switch', 'switch_delay')
+
+def preset_value(value):
+    """ value like it's stored in a preset, zones are stored by name """
+    if isinstance(value, AudioZone):
+        return repr(value)
+    return value
+
+class Preset():
+    """ settings of all outputs of a switch, by output name. created by capture_preset() and restored by apply_preset() """
+    def __init__(self, outputs=None, model=None):
+        self.model = model
+        self.outputs = {} if (outputs is None) else outputs
+
+    @classmethod
+    def capture(cls, remote):
+        """ preset with the cached values of all outputs of the remote """
+        outputs = {}
+        for bay in remote.outputs:
+            values = {}
+            for name in PRESET_VALUES:
+                values[name] = preset_value(bay.value(name).last_value)
+            outputs[repr(bay)] = values
+        return cls(outputs, remote.model)
+
+    def to_dict(self):
+        """ the preset as dict that can be stored as json """
+        return {'model': self.model, 'outputs': self.outputs}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('outputs'), data.get('model'))
+
+    def __repr__(self):
+        return "preset model:{} outputs:{}".format(self.model, len(self.outputs))
+
+class PresetResult():
+    """ result of apply_preset() """
+    def __init__(self, commands, failed, duration):
+        # number of commands that were sent
+        self.commands = commands
+        # (output name, value name) of the values that couldn't be changed
+        self.failed = failed
+        # seconds it took to apply the preset
+        self.duration = duration
+
+    @property
+    def success(self):
+        return len(self.failed) == 0
+
+    def __repr__(self):
+        return "{} commands, {} failed in {:.3f}s".format(self.commands, len(self.failed), self.duration)
+
+def preset_plan(remote, preset):
+    """ (ZoneValue, encoded value) of the values that differ from the cached values, in the order they have to be sent:
+        outputs are muted first, then the audio is routed and the other values are changed, and then they're unmuted """
+    mutes = []
+    routes = []
+    settings = []
+    unmutes = []
+    for name, values in preset.outputs.items():
+        bay = remote.get_by_name(False, None, name)
+        if bay is None:
+            _LOGGER.warning("output {} of the preset doesn't exist".format(name))
+            continue
+        rerouted = False
+        for value_name, target in values.items():
+            if (value_name == 'mute') or (target is None):
+                continue
+            val = bay.value(value_name)
+            if preset_value(val.last_value) == target:
+                continue
+            if value_name in _ROUTING_VALUES:
+                rerouted = True
+                routes.append((val, val.encode(target)))
+            else:
+                settings.append((val, val.encode(target)))
+
+        mute = bay.value('mute')
+        muted = mute.last_value
+        target = values.get('mute')
+        if target is None:
+            target = muted
+        if rerouted:
+            # mute while the audio is routed
+            if muted is not True:
+                mutes.append((mute, mute.encode(True)))
+            if target is False:
+                unmutes.append((mute, mute.encode(False)))
+        elif (target is not None) and (target != muted):
+            (mutes if target else unmutes).append((mute, mute.encode(target)))
+    return _unique(mutes) + _unique(routes) + _unique(settings) + _unique(unmutes)
+
+def preset_values(remote, preset):
+    """ ZoneValues in the preset without cached value, that have to be read before it can be applied """
+    rv = []
+    for name, values in preset.outputs.items():
+        bay = remote.get_by_name(False, None, name)
+        if bay is not None:
+            for value_name in values:
+                val = bay.value(value_name)
+                if val.last_value is None:
+                    rv.append(val)
+    return rv
+
+def _unique(writes):
+    # analog and digital outputs with the same number share most values, only write them once
+    keys = {}
+    rv = []
+    for val, value in writes:
+        if val.key not in keys:
+            keys[val.key] = True
+            rv.append((val, value))
+    return rv
@@ -1,13 +1,27 @@
 #!/usr/bin/python3
 
+import asyncio
+from collections import deque
 import os
 import logging
+import time
 from typing import Tuple
 
 from .zone import *
 from .input import *
 from .output import *
 from .connection import *
+from .async_connection import *
+from .snapshot import *
+from .scheduler import *
+from .state import *
+from .zonelist import *
+from .coalescer import *
+from .preset import *
+from .cache import *
+from .metrics import *
+from .capture import *
+from .events import *
 
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.setLevel(logging.DEBUG)
@@ -19,12 +33,40 @@ class RemoteCallbacks():
     def on_connection_lost(self, remote):
         _LOGGER.info("connection to " + str(remote.target_ip) + " lost")
 
-    def on_zone_updated(self, remote, zone):
+    def on_zone_updated(self, zone):
         _LOGGER.info("zone updated: " + str(zone))
 
-class Remote(ConnectionCallback):
-    ''' Main component that handles the network connections and registration of remote devices '''
-    def __init__(self, target_ip:str, model:str=None, callbacks:RemoteCallbacks=None):
+    def on_zones_updated(self, zones):
+        """ called once with all zones that were changed by a poll cycle or update """
+        for zone in zones:
+            self.on_zone_updated(zone)
+
+def _index_by_id(segments):
+    rv = {}
+    for segment in segments:
+        pos = 0
+        while pos < len(segment):
+            rv.setdefault(segment.kind.zone_number(pos + 1), (segment, pos))
+            pos += 1
+    return rv
+
+def _index_by_name(segments):
+    rv = {}
+    for segment in segments:
+        pos = 0
+        while pos < len(segment):
+            rv.setdefault(segment.kind.zone_name(pos + 1), (segment, pos))
+            pos += 1
+    return rv
+
+class RemoteBase():
+    ''' Zones and model information of a switch, shared by Remote and AsyncRemote '''
+    blocking = True
+    # zones can be restored from the cache before the connection is created
+    _conn = None
+
+    def __init__(self, model:str=None, callbacks:RemoteCallbacks=None, max_poll_rate:float=50, write_interval:float=0.2, scheduler:PollScheduler=None,
+                 cache_file:str=None):
         self._model_version = None
         self._model = model
         self.inputs_analog = []
@@ -34,29 +76,46 @@ class Remote(ConnectionCallback):
         self.outputs_digital = []
         self.outputs = []
         self._ports_created = False
+        self.state = StateTable()
+        # the scheduler can be shared by multiple remotes, see RemoteManager
+        self._scheduler = scheduler if (scheduler is not None) else PollScheduler(max_poll_rate)
+        # (time, value) of the values that are read by the next poll without the rate limit of the scheduler, see _take_burst()
+        self._burst = deque()
+        self._writes = WriteCoalescer(write_interval)
         self._callbacks = callbacks
-        self._conn = Connection(self, target_ip)
-
-    def close(self):
-        self._conn.close()
+        self._subscribers = ChangeSubscribers()
+        self._cache = StateCache(cache_file) if (cache_file is not None) else None
+        self._cached_model = None
+        if self._cache is not None:
+            self._restore_cache()
 
     @property
     def target_ip(self):
         return self._conn.target_ip
 
-    def _set_extio(self):
-        return self.send_command("^XS +32768$")
+    @property
+    def connected(self):
+        return self._conn.connected
 
-    def _read_model_version(self):
-        ver = str(self.send_command("^V ?$")).split(",")
+    def _parse_model_version(self, resp):
+        ver = str(resp).split(",")
         model = ver[0].split('"')
         self._model_version = [model[1], ver[1], ver[2]]
 
-    def on_connected(self):
-        _LOGGER.debug("connected to {}".format(self.target_ip))
-        self._set_extio()
-        self._read_model_version()
+    def _on_connected(self):
+        if (self._cached_model is not None) and (self._cached_model != self.model):
+            _LOGGER.warning("model changed from {} to {}, discarding the cached state".format(self._cached_model, self.model))
+            self._discard_ports()
+        self._cached_model = None
         self._create_ports()
+        self._scheduler.remove(lambda val: val.zone._conn is self)
+        self._burst.clear()
+        now = time.time()
+        for val in self._values():
+            # polled values, and a single read of the values that weren't read yet or were restored from the cache,
+            # so remotes that don't block get them without a read by the caller
+            if (val.timeout > 0) or (val.last_refresh is None):
+                self._burst.append((now, val))
 
         if self._callbacks is not None:
             try:
@@ -66,9 +125,8 @@ class Remote(ConnectionCallback):
         return True
 
     def on_connection_lost(self):
-        for bay in self.inputs:
-            bay.reset()
-        for bay in self.outputs:
+        self._writes.clear()
+        for bay in self._zones():
             bay.reset()
         
         if self._callbacks is not None:
@@ -77,90 +135,110 @@ class Remote(ConnectionCallback):
             except Exception as cbx:
                 _LOGGER.error("callback failed: " + str(cbx))
 
-    @property
-    def connected(self):
-        return self._conn.connected
-
-    def send_command(self, cmd):
-        return self._conn.send_command(cmd)
-
     def get_by_id(self, inp, digital, nb):
-        v = self.inputs if inp else self.outputs
-        for bay in v:
-            if bay.zone == int(nb):
-                return bay
-        return "(unknown zone {})".format(nb)
+        entry = self._ids[(inp, digital)].get(int(nb)) if self._ports_created else None
+        if entry is None:
+            return "(unknown zone {})".format(nb)
+        return entry[0].get(entry[1])
 
     def get_by_name(self, inp, digital, nb):
         nb = str(nb).replace("'", "")
-        v = self.inputs if inp else self.outputs
-        for bay in v:
-            if repr(bay) == str(nb):
-                return bay
-        return None
+        entry = self._names[inp].get(nb) if self._ports_created else None
+        if entry is None:
+            return None
+        return entry[0].get(entry[1])
 
     def _create_ports(self):
         if self._ports_created:
             return
+        # zones are only created when they're used
+        outputs_analog = self._segment(self.nb_outputs_analog, AudioZoneAnalogOutput)
+        outputs_digital = self._segment(self.nb_outputs_digital, AudioZoneDigitalOutput)
+        inputs_analog = self._segment(self.nb_inputs_analog, AudioZoneAnalogIn)
+        inputs_coax = self._segment(self.nb_inputs_coax, AudioZoneAnalogCoaxIn)
+        inputs_optical = self._segment(self.nb_inputs_optical, AudioZoneAnalogOpticalIn)
+        inputs_mirror = self._segment(self.nb_outputs_analog, AudioZoneDigitalAnalogMirrorIn)
+        disconnected_analog = ZoneSegment(1, AudioZoneDisconnected, lambda nb: AudioZoneDisconnected(False))
+        disconnected_digital = ZoneSegment(1, AudioZoneDisconnected, lambda nb: AudioZoneDisconnected(True))
+        self.outputs_analog = LazyZoneList([outputs_analog])
+        self.outputs_digital = LazyZoneList([outputs_digital])
+        self.outputs = LazyZoneList([outputs_analog, outputs_digital])
+        self.inputs_analog = LazyZoneList([inputs_analog, disconnected_analog])
+        self.inputs_digital = LazyZoneList([inputs_coax, inputs_optical, inputs_mirror, disconnected_digital])
+        self.inputs = LazyZoneList([inputs_analog, inputs_coax, inputs_optical, inputs_mirror, disconnected_digital])
+        # (input, digital) -> zone number -> (segment, position) and input -> name -> (segment, position)
+        self._ids = {
+            (False, False): _index_by_id([outputs_analog]),
+            (False, True): _index_by_id([outputs_digital]),
+            (True, False): _index_by_id([inputs_analog, inputs_coax, inputs_optical, inputs_mirror, disconnected_analog]),
+            (True, True): _index_by_id([inputs_coax, inputs_optical, inputs_mirror, disconnected_digital]),
+        }
+        self._names = {
+            False: _index_by_name([outputs_analog, outputs_digital]),
+            True: _index_by_name([inputs_analog, inputs_coax, inputs_optical, inputs_mirror, disconnected_digital]),
+        }
+        # set last, other threads use the zones once ready is set
         self._ports_created = True
-        ptr = 0
-        while ptr < self.nb_outputs_analog:
-            ptr += 1
-            o = AudioZoneAnalogOutput(ptr, self)
-            self.outputs_analog.append(o)
-            self.outputs.append(o)
-        ptr = 0
-        while ptr < self.nb_outputs_digital:
-            ptr += 1
-            o = AudioZoneDigitalOutput(ptr, self)
-            self.outputs_digital.append(o)
-            self.outputs.append(o)
-        ptr = 0
-        while ptr < self.nb_inputs_analog:
-            ptr += 1
-            o = AudioZoneAnalogIn(ptr, self)
-            self.inputs_analog.append(o)
-            self.inputs.append(o)
-        self.inputs_analog.append(AudioZoneDisconnected(False))
-        ptr = 0
-        while ptr < self.nb_inputs_coax:
-            ptr += 1
-            o = AudioZoneAnalogCoaxIn(ptr, self)
-            self.inputs_digital.append(o)
-            self.inputs.append(o)
-        ptr = 0
-        while ptr < self.nb_inputs_optical:
-            ptr += 1
-            o = AudioZoneAnalogOpticalIn(ptr, self)
-            self.inputs_digital.append(o)
-            self.inputs.append(o)
-        ptr = 0
-        while ptr < self.nb_outputs_analog:
-            ptr += 1
-            o = AudioZoneDigitalAnalogMirrorIn(ptr, self)
-            self.inputs_digital.append(o)
-            self.inputs.append(o)
-        self.inputs_digital.append(AudioZoneDisconnected(True))
-        self.inputs.append(AudioZoneDisconnected(True))
-
-    def get_power(self):
-        return str(self.send_command("^P ?$")[4:5]) == '1'
 
-    def set_power(self, pwr):
-        if self.get_power() != pwr:
-            _LOGGER.info("Powering {}".format("on" if pwr else "off"))
-        cmd = "^P {}$".format("1" if pwr else "0")
-        return self.send_command(cmd)
+    def _discard_ports(self):
+        self._scheduler.remove(lambda val: val.zone._conn is self)
+        self._burst.clear()
+        self.state = StateTable()
+        self._ports_created = False
 
-    def get_version_info(self):
-        if self._version is None:
-            try:
-                ver = str(self.send_command("^V ?$", is_init_cmd=True)).split(",")
-                model = ver[0].split('"')
-                self._version = [model[1], ver[1], ver[2]]
-            except Exception:
-                pass
-        return self._version
+    @property
+    def ready(self):
+        """ True if the zones were created, after connecting or from the cache """
+        return self._ports_created
+
+    def _segment(self, count, kind):
+        return ZoneSegment(count, kind, lambda nb: kind(nb, self), self._new_zone)
+
+    def _new_zone(self, zone):
+        # called when a zone is used for the first time. values that aren't polled are read once.
+        # the connection is woken up to read them now, instead of after its current wait for next_poll()
+        now = time.time()
+        self._burst.extend((now, val) for val in zone.values)
+        if self._conn is not None:
+            self._conn.wakeup()
+        return zone
+
+    def _zones(self):
+        """ inputs and outputs that were created """
+        if not self._ports_created:
+            return []
+        return self.inputs.materialized() + self.outputs.materialized()
+
+    def _update_values(self, cmd, zone, create=False):
+        # values to update when the switch reports a change, without creating zones unless create is set.
+        # analog and digital outputs with the same number share settings like the volume
+        if (zone is None) or not zone.isdigit() or not self._ports_created:
+            return []
+        nb = int(zone)
+        rv = []
+        for index in (self._ids[(True, False)], self._ids[(False, False)], self._ids[(False, True)]):
+            entry = index.get(nb)
+            if entry is None:
+                continue
+            bay = entry[0].get(entry[1]) if create else entry[0].peek(entry[1])
+            if bay is not None:
+                for val in bay.values:
+                    if val.cmd == cmd:
+                        rv.append(val)
+        return rv
+
+    def on_update(self, data):
+        """ process an unsolicited update from the switch, like b"^=VPZ @001,50$" """
+        parsed = parse_response(data)
+        values = self._update_values(parsed[0][0], parsed[0][1]) if (parsed is not None) else []
+        if len(values) == 0:
+            _LOGGER.debug("unhandled update: " + str(data))
+            return
+        value = parsed[1]
+        for val in values:
+            if not self._writes.pending(val):
+                val.update_value(value)
+        self._dispatch_updates()
 
     @property
     def nb_ports(self):
@@ -208,6 +286,247 @@ class Remote(ConnectionCallback):
     def serial(self):
         return self._model_version[2] if self._model_version is not None else None
 
+    def _values(self, all_zones=False):
+        # values of the zones that were created, or of all zones
+        rv = []
+        for bay in (self.inputs + self.outputs) if all_zones else self._zones():
+            rv.extend(bay.values)
+        return rv
+
+    @property
+    def poll_lag(self):
+        """ seconds that the last polled values were refreshed after they were due """
+        return self._scheduler.lag
+
+    def next_poll(self):
+        """ seconds until the next value has to be polled """
+        due = self._scheduler.next_due()
+        return 1 if (due is None) else due
+
+    def _take_burst(self):
+        # values to read after connecting or creating a zone. they're read in one pipelined burst instead of at the
+        # poll rate, which would take 20 seconds for the zones of a ProAudio64. later refreshes go through the scheduler
+        rv = []
+        while len(self._burst) > 0:
+            queued, val = self._burst.popleft()
+            if (val.last_refresh is not None) and (val.last_refresh > queued):
+                # refreshed by a read, write or update from the switch since it was queued, like the scheduler does
+                self._scheduler.schedule(val)
+                continue
+            rv.append(val)
+        return rv
+
+    def _reschedule(self, values, failed):
+        # values that couldn't be refreshed are retried with a backoff, they keep their last refresh time.
+        # values that aren't polled were only refreshed once
+        failed = set(failed)
+        for val in values:
+            if val in failed:
+                self._scheduler.retry(val)
+            else:
+                self._scheduler.schedule(val)
+
+    def _queries(self, values):
+        # values that are read with the same command, like the volume of the analog and digital output
+        # with the same number, are only queried once
+        rv = {}
+        for val in values:
+            query = val.query
+            if query not in rv:
+                rv[query] = []
+            rv[query].append(val)
+        return rv
+
+    def _apply_responses(self, queries, responses):
+        # returns the values that couldn't be refreshed
+        failed = []
+        for values, resp in zip(queries.values(), responses):
+            if isinstance(resp, Exception):
+                # values that weren't answered keep their cached value
+                failed.extend(values)
+                continue
+            value = resp.zone_resp()
+            # also update values that weren't queried but share the same setting
+            values = self._update_values(values[0].cmd, values[0].zone.zonefmt)
+            for val in values:
+                # don't overwrite the value of writes that weren't sent yet
+                if not self._writes.pending(val):
+                    val.update_value(value)
+        if len(failed) > 0:
+            _LOGGER.debug("failed to refresh {} values".format(len(failed)))
+        self._dispatch_updates()
+        return failed
+
+    def subscribe(self, callback, attributes=None):
+        """ call callback(events) once per poll cycle with a ChangeEvent (zone, attribute, old, new, timestamp)
+            for every value that was changed by the switch or a setter. with attributes (like ["volume", "mute"])
+            only changes of those are passed. returns a function that removes the subscription """
+        return self._subscribers.subscribe(callback, attributes)
+
+    def _values_changed(self):
+        # called after values were changed by a setter, so the changes are reported right away instead of with the next poll
+        self._dispatch_updates()
+
+    def _dispatch_updates(self):
+        # pass the changes to the subscribers and call on_zones_updated() once with every zone with changed values
+        events = []
+        updated = {}
+        for slot, change in self.state.take_changes().items():
+            val = self.state.owners[slot]
+            new = val.last_value
+            # values that were changed back since the last poll cycle aren't reported
+            if change[0] != new:
+                events.append(ChangeEvent(val.zone, val.name, change[0], new, change[1]))
+                updated[val.zone] = True
+        if len(events) == 0:
+            return
+        if len(self._subscribers) > 0:
+            self._subscribers.dispatch(events)
+        self.on_zones_updated(list(updated))
+
+    def queue_write(self, value, new_value, cmd):
+        """ queue cmd, that writes new_value to the ZoneValue value, in the write coalescer """
+        delay = self._writes.add(value, new_value, cmd)
+        if delay is not None:
+            self._schedule_flush(delay)
+
+    @property
+    def dropped_writes(self):
+        """ number of queued writes that were replaced by a later write before they were sent """
+        return self._writes.dropped
+
+    def _write_batch(self, writes):
+        # commands and keys of the queued writes
+        return [w[2] for w in writes], [w[0].key for w in writes]
+
+    def _write_results(self, writes, responses):
+        # values that couldn't be written are read from the switch again, the others store the value that the
+        # switch returned. values that were written again in the mean time keep the value of the newer write
+        for (val, new_value, cmd), resp in zip(writes, responses):
+            if isinstance(resp, Exception):
+                _LOGGER.warning("failed to write {} = {}".format(repr(val.zone), repr(val)))
+                if not self._writes.pending(val):
+                    val._reset_written()
+            elif not self._writes.pending(val):
+                val._written(resp, new_value)
+        self._values_changed()
+
+    def _eq_writes(self, outputs, values):
+        # (output, band, ZoneValue, value) of the equaliser bands to change, and the commands per (command, zone).
+        # analog and digital outputs with the same number share their equaliser, each band is only sent once
+        writes = []
+        cmds = {}
+        for bay in outputs:
+            for band, val, value in bay._eq_changes(values):
+                writes.append((bay, band, val, value))
+                if val.key not in cmds:
+                    cmds[val.key] = val.command(val.encode(value))
+        return writes, cmds
+
+    def _eq_results(self, writes, cmds, responses):
+        # update the cached values and return the bands that failed per output
+        if len(writes) == 0:
+            return {}
+        ok = {key: not isinstance(resp, Exception) for key, resp in zip(cmds, responses)}
+        rv = {}
+        for bay, band, val, value in writes:
+            failed = rv.setdefault(bay, [])
+            if ok[val.key]:
+                val._store_written(value)
+            else:
+                val._reset_written()
+                failed.append(band)
+        self._values_changed()
+        return rv
+
+    def _preset_output_values(self):
+        # values of all outputs that are stored in a preset
+        rv = []
+        for bay in self.outputs:
+            for val in bay.values:
+                if val.name in PRESET_VALUES:
+                    rv.append(val)
+        return rv
+
+    def _preset_batch(self, plan):
+        # commands and keys of the values that a preset changes
+        return [val.command(value) for val, value in plan], [val.key for val, value in plan]
+
+    def _preset_results(self, plan, responses, start):
+        # update the cached values and return the PresetResult with the (output name, value name) of the values that failed
+        failed = []
+        for (val, value), resp in zip(plan, responses):
+            if not isinstance(resp, Exception):
+                val.set_encoded(value)
+            else:
+                val._reset_written()
+                failed.append((repr(val.zone), val.name))
+        self._values_changed()
+        return PresetResult(len(plan), failed, time.time() - start)
+
+    def _restore_cache(self):
+        # create the zones with the values of the last run, they're refreshed once the switch is connected
+        cached = self._cache.load()
+        if cached is None:
+            return
+        model_version, values = cached
+        if (self._model is not None) and (str(self._model) != model_version[0]):
+            _LOGGER.warning("cached model {} doesn't match {}".format(model_version[0], self._model))
+            return
+        self._model_version = model_version
+        self._cached_model = model_version[0]
+        self._create_ports()
+        for (cmd, zone), value in values.items():
+            for val in self._update_values(cmd, zone, True):
+                val.restore(value)
+        self._cache.last_save = time.time()
+
+    def save_cache(self):
+        """ store the model and the cached values in the cache file """
+        if (self._cache is None) or (self._model_version is None):
+            return
+        values = {}
+        for val in self.state.owners:
+            value = val.encoded()
+            if value is not None:
+                values[val.key] = value
+        self._cache.save(self._model_version, values)
+
+    def _save_cache_on_close(self):
+        if self._cache is not None:
+            try:
+                self.save_cache()
+            except Exception as e:
+                _LOGGER.warning("failed to save the cache: " + str(e))
+
+    def _save_cache_if_due(self):
+        if (self._cache is not None) and self._cache.due:
+            try:
+                self.save_cache()
+            except Exception as e:
+                _LOGGER.warning("failed to save the cache: " + str(e))
+
+    def stats(self):
+        """ snapshot of the metrics of the connection and the poll scheduler, see render_openmetrics() """
+        rv = self._conn.metrics.snapshot()
+        rv['connected'] = self.connected
+        rv['scheduled_values'] = len(self._scheduler)
+        rv['poll_lag'] = self._scheduler.lag
+        rv['max_poll_lag'] = self._scheduler.max_lag
+        rv['dropped_writes'] = self._writes.dropped
+        return rv
+
+    @staticmethod
+    def _recorder(capture_file):
+        return CaptureRecorder(capture_file) if (capture_file is not None) else None
+
+    def _poll_done(self, start):
+        self._conn.metrics.poll_duration.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        """ cached state of all zones """
+        return Snapshot(self)
+
     def on_zone_updated(self, zone):
         if self._callbacks is not None:
             try:
@@ -215,14 +534,275 @@ class Remote(ConnectionCallback):
             except Exception as cbx:
                 _LOGGER.error("callback failed: " + str(cbx))
 
-    def poll(self):
-        for bay in self.inputs:
-            if bay.poll():
-                self.on_zone_updated(bay)
-        for bay in self.outputs:
-            if bay.poll():
-                self.on_zone_updated(bay)
+    def on_zones_updated(self, zones):
+        if self._callbacks is not None:
+            try:
+                self._callbacks.on_zones_updated(zones)
+            except Exception as cbx:
+                _LOGGER.error("callback failed: " + str(cbx))
+
+    async def async_apply_eq(self, outputs, values):
+        """ change the equaliser of all outputs to values (in dB, None to leave a band unchanged), only sending
+            the bands that differ from the cached values in one pipelined batch.
+            returns the numbers of the bands that failed per output """
+        writes, cmds = self._eq_writes(outputs, values)
+        return self._eq_results(writes, cmds, await self._async_send_batch(list(cmds.values()), list(cmds)))
+
+    async def async_capture_preset(self):
+        """ read the settings of all outputs in one pipelined burst and return them as Preset """
+        await self._async_refresh(self._preset_output_values())
+        return Preset.capture(self)
+
+    async def async_apply_preset(self, preset:Preset):
+        """ change the outputs to the settings of the preset, only sending the commands for values that differ
+            from the cached values in one pipelined batch. returns a PresetResult """
+        start = time.time()
+        await self._async_refresh(preset_values(self, preset))
+        plan = preset_plan(self, preset)
+        return self._preset_results(plan, await self._async_send_batch(*self._preset_batch(plan)), start)
+
+    async def async_refresh_all(self):
+        """ read all values of all zones in one pipelined burst and return the new Snapshot """
+        await self._async_refresh(self._values(True))
+        return self.snapshot()
+
+    def _refresh_batch(self, values):
+        # the values per query, and the commands and keys of the queries
+        queries = self._queries(values)
+        return queries, list(queries), [values[0].key for values in queries.values()]
+
+    async def _async_refresh(self, values):
+        # returns the values that couldn't be refreshed
+        queries, cmds, keys = self._refresh_batch(values)
+        return self._apply_responses(queries, await self._async_send_batch(cmds, keys))
+
+    async def _async_send_batch(self, cmds, keys):
+        # send step of the batches that are built above, returns the response or the exception per command.
+        # Remote has a blocking version in _send_batch()
+        if len(cmds) == 0:
+            return []
+        try:
+            return await self.async_send_many(cmds, keys, return_exceptions=True)
+        except Exception as e:
+            _LOGGER.debug("failed to send {} commands: {}".format(len(cmds), str(e)))
+            return [e] * len(cmds)
 
     def __str__(self):
         return "model:{} version:{} serial:{}".format(self.model, self.version, self.serial)
 
+class Remote(RemoteBase, ConnectionCallback):
+    ''' Main component that handles the network connections and registration of remote devices '''
+    def __init__(self, target_ip:str, model:str=None, callbacks:RemoteCallbacks=None, max_poll_rate:float=50, write_interval:float=0.2,
+                 cache_file:str=None, port:int=50005, capture_file:str=None, transport=None, blocking:bool=True):
+        super().__init__(model, callbacks, max_poll_rate, write_interval, cache_file=cache_file)
+        # with blocking=False zone properties only return cached values, that are refreshed by the poll thread,
+        # so reading them never waits for the switch
+        self.blocking = blocking
+        self._conn = Connection(self, target_ip, port, recorder=self._recorder(capture_file), transport=transport)
+
+    def close(self):
+        self._save_cache_on_close()
+        self._conn.close()
+
+    def _set_extio(self):
+        return self.send_command("^XS +32768$")
+
+    def _read_model_version(self):
+        self._parse_model_version(self.send_command("^V ?$"))
+
+    def _values_changed(self):
+        # the changes are reported by the poll cycle of the connection thread, which is woken up for it
+        self._conn.wakeup()
+
+    def on_connected(self):
+        _LOGGER.debug("connected to {}".format(self.target_ip))
+        self._set_extio()
+        self._read_model_version()
+        return self._on_connected()
+
+    def send_command(self, cmd, key=None, timeout:float=None):
+        """ send a command and return its response, raises CommandTimeout if it isn't answered within timeout seconds """
+        return self._conn.send_command(cmd, key, timeout)
+
+    def send_many(self, cmds, keys=None, timeout:float=None):
+        """ send a batch of commands in one pipelined burst, returns a future per command.
+            commands that aren't answered within timeout seconds fail with CommandTimeout """
+        return self._conn.send_many(cmds, keys, timeout)
+
+    def cancel_commands(self):
+        """ cancel the commands that weren't sent to the switch yet, returns the number of commands """
+        return self._conn.cancel_queued()
+
+    async def async_send_command(self, cmd, key=None, timeout:float=None):
+        """ send a command from an asyncio event loop without blocking it, it's sent by the connection thread """
+        return (await self.async_send_many([cmd], [key], timeout=timeout))[0]
+
+    async def async_send_many(self, cmds, keys=None, return_exceptions=False, timeout:float=None):
+        """ send a batch of commands from an asyncio event loop without blocking it, returns the response per command.
+            commands of concurrent calls are pipelined together by the connection thread. commands that aren't
+            answered within timeout seconds fail with CommandTimeout, commands that weren't sent yet are
+            cancelled when the calling task is cancelled """
+        if keys is None:
+            keys = [None] * len(cmds)
+        deadline = self._conn.deadline(timeout, len(cmds))
+        futures = [asyncio.wrap_future(self._conn.submit_threadsafe(cmd, key, deadline)) for cmd, key in zip(cmds, keys)]
+        return await asyncio.gather(*futures, return_exceptions=return_exceptions)
+
+    def get_power(self):
+        return str(self.send_command("^P ?$")[4:5]) == '1'
+
+    def set_power(self, pwr):
+        if self.get_power() != pwr:
+            _LOGGER.info("Powering {}".format("on" if pwr else "off"))
+        cmd = "^P {}$".format("1" if pwr else "0")
+        return self.send_command(cmd)
+
+    def get_version_info(self):
+        if self._version is None:
+            try:
+                ver = str(self.send_command("^V ?$", is_init_cmd=True)).split(",")
+                model = ver[0].split('"')
+                self._version = [model[1], ver[1], ver[2]]
+            except Exception:
+                pass
+        return self._version
+
+    def next_poll(self):
+        rv = super().next_poll()
+        flush = self._writes.next_flush()
+        return rv if (flush is None) else min(rv, flush)
+
+    def poll(self):
+        if self._writes.next_flush() == 0:
+            self.flush_writes()
+        values = self._take_burst() + self._scheduler.pop_due()
+        start = time.perf_counter()
+        failed = values
+        try:
+            failed = self._refresh(values)
+        finally:
+            self._reschedule(values, failed)
+            if len(values) > 0:
+                self._poll_done(start)
+        # changes that were made by setters on other threads
+        self._dispatch_updates()
+        self._save_cache_if_due()
+
+    def flush_writes(self):
+        """ send the writes that were queued by queue_write() now """
+        writes = self._writes.take()
+        if len(writes) > 0:
+            self._write_results(writes, self._send_batch(*self._write_batch(writes)))
+
+    def _schedule_flush(self, delay):
+        # the writes are flushed by poll() on the connection thread, which is woken up to wait for next_poll() again
+        self._conn.wakeup()
+
+    def apply_eq(self, outputs, values):
+        """ blocking version of async_apply_eq() """
+        writes, cmds = self._eq_writes(outputs, values)
+        return self._eq_results(writes, cmds, self._send_batch(list(cmds.values()), list(cmds)))
+
+    def capture_preset(self):
+        """ blocking version of async_capture_preset() """
+        self._refresh(self._preset_output_values())
+        return Preset.capture(self)
+
+    def apply_preset(self, preset:Preset):
+        """ blocking version of async_apply_preset() """
+        start = time.time()
+        self._refresh(preset_values(self, preset))
+        plan = preset_plan(self, preset)
+        return self._preset_results(plan, self._send_batch(*self._preset_batch(plan)), start)
+
+    def refresh_all(self):
+        """ blocking version of async_refresh_all() """
+        self._refresh(self._values(True))
+        return self.snapshot()
+
+    def _refresh(self, values):
+        # returns the values that couldn't be refreshed
+        queries, cmds, keys = self._refresh_batch(values)
+        return self._apply_responses(queries, self._send_batch(cmds, keys))
+
+    def _send_batch(self, cmds, keys):
+        # blocking version of _async_send_batch()
+        if len(cmds) == 0:
+            return []
+        try:
+            futures = self.send_many(cmds, keys)
+        except Exception as e:
+            _LOGGER.debug("failed to send {} commands: {}".format(len(cmds), str(e)))
+            return [e] * len(cmds)
+        return [f.exception() or f.result() for f in futures]
+
+class AsyncRemote(RemoteBase, AsyncConnectionCallback):
+    ''' Remote that runs on an asyncio event loop. Zone properties only return cached values,
+        use the async_ methods of the zones to read and change them '''
+    blocking = False
+
+    def __init__(self, target_ip:str, model:str=None, callbacks:RemoteCallbacks=None, max_poll_rate:float=50, write_interval:float=0.2,
+                 scheduler:PollScheduler=None, cache_file:str=None, port:int=50005, capture_file:str=None, transport=None):
+        super().__init__(model, callbacks, max_poll_rate, write_interval, scheduler, cache_file)
+        self._conn = AsyncConnection(self, target_ip, port, recorder=self._recorder(capture_file), transport=transport)
+
+    def start(self):
+        """ connect to the switch and keep polling it on the running event loop """
+        self._conn.start()
+
+    async def async_close(self):
+        self._save_cache_on_close()
+        await self._conn.async_close()
+
+    async def async_connect(self):
+        """ connect to the switch if it's not connected, without starting the poll task. returns True if connected """
+        return (await self._conn.async_connection()) is not None
+
+    async def async_on_connected(self):
+        _LOGGER.debug("connected to {}".format(self.target_ip))
+        await self.async_send_command("^XS +32768$")
+        self._parse_model_version(await self.async_send_command("^V ?$"))
+        return self._on_connected()
+
+    def send_command(self, cmd, key=None):
+        raise Exception("blocking commands are not supported, use async_send_command()")
+
+    async def async_send_command(self, cmd, key=None, timeout:float=None):
+        """ send a command and return its response, raises CommandTimeout if it isn't answered within timeout seconds """
+        return await self._conn.async_send_command(cmd, key, timeout)
+
+    async def async_send_many(self, cmds, keys=None, return_exceptions=False, timeout:float=None):
+        """ send a batch of commands in one pipelined burst, returns the response per command.
+            commands that aren't answered within timeout seconds fail with CommandTimeout """
+        return await self._conn.async_send_many(cmds, keys, return_exceptions, timeout)
+
+    def cancel_commands(self):
+        """ cancel the commands that weren't sent to the switch yet, returns the number of commands """
+        return self._conn.cancel_queued()
+
+    async def async_poll(self):
+        await self.async_poll_values(self._take_burst() + self._scheduler.pop_due())
+
+    async def async_poll_values(self, values):
+        """ refresh values that are due and schedule their next refresh """
+        start = time.perf_counter()
+        failed = values
+        try:
+            failed = await self._async_refresh(values)
+        finally:
+            self._reschedule(values, failed)
+            if len(values) > 0:
+                self._poll_done(start)
+        # changes that weren't reported yet
+        self._dispatch_updates()
+        self._save_cache_if_due()
+
+    async def async_flush_writes(self):
+        """ send the writes that were queued by queue_write() now """
+        writes = self._writes.take()
+        if len(writes) > 0:
+            self._write_results(writes, await self._async_send_batch(*self._write_batch(writes)))
+
+    def _schedule_flush(self, delay):
+        asyncio.get_running_loop().call_later(delay, lambda: asyncio.ensure_future(self.async_flush_writes()))
+
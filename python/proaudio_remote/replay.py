@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+# Replays a capture that was recorded with Remote(..., capture_file="living.cap") through Remote:
+#   python3 -m proaudio_remote.replay living.cap --speed 0
+
+import argparse
+import time
+import logging
+from .proaudio import *
+_LOGGER = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="replay a ProAudio capture through Remote")
+    parser.add_argument('capture')
+    parser.add_argument('--speed', type=float, default=1, help="replay speed, 0 for as fast as possible")
+    parser.add_argument('--timeout', type=float, default=None, help="stop after this many seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    transport = ReplayTransport(args.capture, args.speed)
+    start = time.monotonic()
+    remote = Remote("replay", transport=transport)
+    try:
+        while not remote.ready and not transport.finished.is_set():
+            time.sleep(0.001)
+        # create the zones that the client that made the capture used, so they're polled the same way
+        for cmd, zone in transport.keys:
+            remote._update_values(cmd, zone, True)
+        transport.wait(args.timeout)
+    except KeyboardInterrupt:
+        pass
+    duration = time.monotonic() - start
+    remote.close()
+    print("replayed {} in {:.3f}s, {} mismatches".format(args.capture, duration, transport.mismatches))
+    print(render_openmetrics(remote.stats()), end='')
+
+if __name__ == "__main__":
+    main()
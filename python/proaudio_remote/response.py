@@ -1,39 +1,56 @@
 import logging
+import re
 import time
 _LOGGER = logging.getLogger(__name__)
 
+# "^=CMD @zone,value$", the zone and value are optional and anything up to the first ',' is skipped
+_RESPONSE = re.compile(r'\^=([^ ,$]*)(?: @([^ ,$]*))?[^,$]*(?:,([^$]*))?\$')
+
 class CommandResponse():
-    def __init__(self, cmd, resp):
+    """ response to a command. it's parsed and validated once, by parse_response() """
+    def __init__(self, cmd, resp=None, value=None):
         self._cmd = cmd
-        if resp is not None:
-            resp = resp.decode().split("\r\n")
-            if resp[0] != '^+$':
-                # not a response header
-                raise Exception("command failed: " +str(cmd) + " = " + resp[0])
-            self._resp = resp[1]
-        else:
-            self._resp = None
+        self._resp = resp
+        self._value = value
 
-    def zone_resp(self):
-        if self._resp is None:
-            return None
-        exp = self._expected_response_start()
-        resp = str(self)
-        l = len(exp)+1
-        if resp[1:l] != exp:
-            raise Exception("invalid response {} to command {} (3) = {} != {}".format(self._resp, self._cmd, resp[1:l], exp))
-        return resp[l+1:]
+    @classmethod
+    def from_frame(cls, cmd, frame):
+        """ response to cmd from the ^=...$ frame that followed the ^+$ header """
+        parsed = parse_response(frame)
+        if parsed is None:
+            return cls(cmd)
+        return cls(cmd, parsed[2], parsed[1])
 
-    def _expected_response_start(self):
-        cmd_split = self._cmd[1:-1].split("?")
-        return "={}".format(cmd_split[0])
+    def zone_resp(self):
+        """ value of the zone that was returned by the switch, like "50" for "^=VPZ @001,50$" """
+        return self._value
 
     def __str__(self):
         if self._resp is None:
             return None
-        if self._resp[0] != '^':
-            raise Exception("invalid response {} to command {} (1) = {}".format(self._resp, self._cmd, self._resp[1]))
-        if self._resp[-1] != '$':
-            raise Exception("invalid response {} to command {} (2)".format(self._resp, self._cmd))
         return self._resp[:-1]
 
+def command_key(cmd):
+    """ (command, zone) of a command like "^VPZ @001?$", used to match the response to it """
+    if not isinstance(cmd, str):
+        cmd = bytes(cmd).decode(errors='replace')
+    cmd = cmd[1:-1]
+    zone = None
+    pos = cmd.find(' ')
+    if pos >= 0:
+        if cmd[pos + 1:pos + 2] == '@':
+            zone = cmd[pos + 2:].split(',')[0].split('?')[0]
+        cmd = cmd[:pos]
+    return (cmd, zone)
+
+def parse_response(frame):
+    """ parse a response frame like b"^=VPZ @001,50$" in a single pass.
+        returns ((command, zone), value, text), or None if the frame isn't a response.
+        zone and value are None if the response doesn't have them """
+    if frame[:2] != b'^=':
+        return None
+    text = bytes(frame).decode(errors='replace')
+    match = _RESPONSE.fullmatch(text)
+    if match is None:
+        return None
+    return ((match.group(1), match.group(2)), match.group(3), text)
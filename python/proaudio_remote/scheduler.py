@@ -0,0 +1,113 @@
+import heapq
+import random
+import threading
+import time
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+class PollScheduler():
+    """ Schedules the polled zone values by the time they're due, using a min-heap.
+        Refresh times are spread with a random jitter and the number of values that are
+        returned per second is limited to max_rate. Values that couldn't be refreshed are retried after
+        retry_interval seconds, doubled with every failure up to max_retry_interval or their refresh interval. """
+    def __init__(self, max_rate:float=50, jitter:float=0.1, retry_interval:float=1, max_retry_interval:float=60):
+        self.max_rate = max_rate
+        self.jitter = jitter
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.lag = 0
+        self.max_lag = 0
+        self._heap = []
+        self._seq = 0
+        # number of failed refreshes per value
+        self._failures = {}
+        self._tokens = max_rate
+        self._last_tokens = time.time()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+            self._failures = {}
+
+    def remove(self, match):
+        """ remove all values for which match(value) returns True """
+        with self._lock:
+            self._heap = [entry for entry in self._heap if not match(entry[3])]
+            heapq.heapify(self._heap)
+            self._failures = {value: count for value, count in self._failures.items() if not match(value)}
+
+    def add(self, value, due=None):
+        """ schedule a value, due now if no time is given """
+        now = time.time()
+        self._push(value, now if (due is None) else due, now)
+
+    def schedule(self, value):
+        """ schedule the next refresh of a value after it was refreshed. values that aren't polled aren't scheduled again """
+        with self._lock:
+            self._failures.pop(value, None)
+        if value.timeout <= 0:
+            return
+        now = time.time()
+        last = value.last_refresh if (value.last_refresh is not None) else now
+        self._push(value, last + self._interval(value), now)
+
+    def retry(self, value):
+        """ schedule a value again after it couldn't be refreshed """
+        now = time.time()
+        with self._lock:
+            failures = self._failures.get(value, 0)
+            self._failures[value] = failures + 1
+        delay = min(self.retry_interval * (2 ** failures), self.max_retry_interval)
+        if value.timeout > 0:
+            delay = min(delay, value.timeout)
+        self._push(value, now + delay, now)
+
+    def next_due(self):
+        """ seconds until the next value is due, or None if nothing is scheduled """
+        with self._lock:
+            if len(self._heap) == 0:
+                return None
+            wait = self._heap[0][0] - time.time()
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.max_rate)
+        return max(0, wait)
+
+    def pop_due(self):
+        """ remove and return the values that are due, at most the number that the rate limit allows """
+        with self._lock:
+            return self._pop_due(time.time())
+
+    def _pop_due(self, now):
+        self._refill(now)
+        rv = []
+        lag = 0
+        while (len(self._heap) > 0) and (self._heap[0][0] <= now) and (self._tokens >= 1):
+            due, seq, scheduled, value = heapq.heappop(self._heap)
+            if (value.last_refresh is not None) and (value.last_refresh > scheduled):
+                # refreshed by a read, write or update from the switch since it was scheduled.
+                # values that aren't polled were only scheduled to be refreshed once
+                self.schedule(value)
+                continue
+            self._tokens -= 1
+            lag = max(lag, now - due)
+            rv.append(value)
+        if len(rv) > 0:
+            self.lag = lag
+            self.max_lag = max(self.max_lag, lag)
+        return rv
+
+    def _interval(self, value):
+        return value.timeout * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def _push(self, value, due, now):
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._heap, (due, self._seq, now, value))
+
+    def _refill(self, now):
+        self._tokens = min(self.max_rate, self._tokens + ((now - self._last_tokens) * self.max_rate))
+        self._last_tokens = now
@@ -0,0 +1,250 @@
+#!/usr/bin/python3
+# Simulated ProAudio switch that speaks the port 50005 protocol, for development and benchmarks without hardware.
+# Run it with: python3 -m proaudio_remote.simulator --model ProAudio16 --latency 0.002 --fragment 8
+
+import argparse
+import asyncio
+import random
+import re
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+_MODELS = {
+    "ProAudio8": 8,
+    "ProAudio16": 16,
+    "ProAudio32": 32,
+    "ProAudio64": 64,
+}
+
+# "CMD @zone?" or "CMD @zone,value"
+_ZONE_COMMAND = re.compile(r'([A-Z0-9]+) @(\d+)(?:(\?)|,(.*))')
+
+# commands that change a zone by "+" and "-", with their limits
+_STEPS = {
+    'VPZ': (0, 100),
+    'BAZ': (0, 255),
+    'TRZ': (0, 255),
+    'GAI': (0, 255),
+}
+
+# zone values that can't be changed
+_READ_ONLY = ('ATZ',)
+
+class SimulatedSwitch():
+    """ state of a simulated switch: zone values by (command, zone number) """
+    def __init__(self, model:str="ProAudio8", version:str="1.0", serial:str="SIM00001"):
+        if model not in _MODELS:
+            raise Exception("unknown model: " + str(model))
+        self.model = model
+        self.version = version
+        self.serial = serial
+        self.ports = _MODELS[model]
+        self.power = True
+        self.extio = 0
+        self.values = {}
+
+    def default(self, cmd, zone):
+        """ value of a zone that wasn't changed yet """
+        if cmd == 'VPZ':
+            return '50'
+        if cmd in ('VMZ', 'DZ', 'DDZ', 'LSZ', 'LSI'):
+            return '0'
+        if cmd.startswith('EQ') or (cmd in ('BAZ', 'TRZ', 'GAI')):
+            return '128'
+        if cmd == 'SZ':
+            # analog outputs are routed to the analog input with the same number
+            return "{0:03d}".format(zone)
+        if cmd == 'DSZ':
+            # digital outputs to the coax input with the same number
+            return "{0:03d}".format(zone + 32)
+        if cmd == 'LZ':
+            return "000"
+        if cmd == 'ATZ':
+            return '2'
+        return '0'
+
+    def valid_zone(self, cmd, zone):
+        if cmd in ('GAI', 'LSI'):
+            # analog, coax, optical and mirror inputs
+            return (1 <= zone <= self.ports) or (33 <= zone <= 32 + self.ports) or (65 <= zone <= 72) or (129 <= zone <= 128 + self.ports)
+        return 1 <= zone <= self.ports
+
+    def get(self, cmd, zone):
+        return self.values.get((cmd, zone), self.default(cmd, zone))
+
+    def set(self, cmd, zone, value):
+        if value in ('+', '-') and (cmd in _STEPS):
+            low, high = _STEPS[cmd]
+            current = int(self.get(cmd, zone))
+            value = str(max(low, min(high, current + (1 if (value == '+') else -1))))
+        elif (value == '+') and (cmd == 'VMZ'):
+            # toggle
+            value = '0' if (self.get(cmd, zone) == '1') else '1'
+        self.values[(cmd, zone)] = value
+        return value
+
+    def execute(self, body):
+        """ execute the command between ^ and $, returns the response frames """
+        if body == 'V ?':
+            return ['^+$', '^=V "{}",{},{}$'.format(self.model, self.version, self.serial)]
+        if body.startswith('XS '):
+            self.extio = int(body[3:])
+            return ['^+$', '^=XS {}$'.format(self.extio)]
+        if body == 'P ?':
+            return ['^+$', '^=P {}$'.format(1 if self.power else 0)]
+        if body in ('P 0', 'P 1'):
+            self.power = (body == 'P 1')
+            return ['^+$', '^=P {}$'.format(body[2])]
+        match = _ZONE_COMMAND.fullmatch(body)
+        if match is None:
+            return ['^!$']
+        cmd = match.group(1)
+        zone = int(match.group(2))
+        if not self.valid_zone(cmd, zone):
+            return ['^!$']
+        if match.group(3) is not None:
+            value = self.get(cmd, zone)
+        elif cmd in _READ_ONLY:
+            return ['^!$']
+        else:
+            value = self.set(cmd, zone, match.group(4))
+        return ['^+$', '^={} @{},{}$'.format(cmd, match.group(2), value)]
+
+class Simulator():
+    """ TCP server that simulates a switch.
+        latency:             seconds before each command is answered, with up to `jitter` seconds added at random
+        fragment:            split what's sent into segments of at most this many bytes, 0 to send everything at once
+        push_interval:       seconds between unsolicited volume changes that are pushed to all clients, 0 to disable
+        disconnect_interval: seconds after which all clients are disconnected, 0 to disable """
+    def __init__(self, model:str="ProAudio8", host:str="127.0.0.1", port:int=50005, latency:float=0, jitter:float=0,
+                 fragment:int=0, push_interval:float=0, disconnect_interval:float=0, seed=None):
+        self.switch = SimulatedSwitch(model)
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.fragment = fragment
+        self.push_interval = push_interval
+        self.disconnect_interval = disconnect_interval
+        self.commands = 0
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._server = None
+        self._tasks = []
+        self._writers = []
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # the port that was bound, when it was started on port 0
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.push_interval > 0:
+            self._tasks.append(asyncio.ensure_future(self._push_loop()))
+        if self.disconnect_interval > 0:
+            self._tasks.append(asyncio.ensure_future(self._disconnect_loop()))
+        _LOGGER.info("simulating a {} on {}:{}".format(self.switch.model, self.host, self.port))
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self.disconnect_all()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self):
+        await self.start()
+        await self._server.serve_forever()
+
+    def push(self, cmd, zone, value):
+        """ change a zone value and send it to all clients, like the switch does when it's changed locally """
+        self.switch.set(cmd, zone, str(value))
+        data = '^={} @{:03d},{}$\r\n'.format(cmd, zone, self.switch.get(cmd, zone)).encode()
+        for writer in self._writers:
+            writer.write(data)
+
+    def disconnect_all(self):
+        """ close the connections of all clients """
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._writers.append(writer)
+        buf = b''
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                buf += data
+                while True:
+                    start = buf.find(b'^')
+                    end = buf.find(b'$', start)
+                    if (start < 0) or (end < 0):
+                        break
+                    body = buf[start + 1:end].decode(errors='replace')
+                    buf = buf[end + 1:]
+                    self.commands += 1
+                    await self._delay()
+                    await self._send(writer, ''.join(frame + '\r\n' for frame in self.switch.execute(body)).encode())
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            if writer in self._writers:
+                self._writers.remove(writer)
+            writer.close()
+
+    async def _delay(self):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if (self.jitter > 0) else 0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _send(self, writer, data):
+        if self.fragment <= 0:
+            writer.write(data)
+        else:
+            # send in segments of random size, so responses are split over multiple reads
+            pos = 0
+            while pos < len(data):
+                size = self._random.randint(1, self.fragment)
+                writer.write(data[pos:pos + size])
+                await writer.drain()
+                pos += size
+        await writer.drain()
+
+    async def _push_loop(self):
+        while True:
+            await asyncio.sleep(self.push_interval)
+            self.push('VPZ', self._random.randint(1, self.switch.ports), self._random.randint(0, 100))
+
+    async def _disconnect_loop(self):
+        while True:
+            await asyncio.sleep(self.disconnect_interval)
+            _LOGGER.info("disconnecting {} clients".format(len(self._writers)))
+            self.disconnect_all()
+
+def main():
+    parser = argparse.ArgumentParser(description="simulated ProAudio switch")
+    parser.add_argument('--model', default="ProAudio8", choices=sorted(_MODELS))
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=50005)
+    parser.add_argument('--latency', type=float, default=0, help="seconds before each command is answered")
+    parser.add_argument('--jitter', type=float, default=0, help="random extra latency in seconds")
+    parser.add_argument('--fragment', type=int, default=0, help="max segment size in bytes, 0 to disable")
+    parser.add_argument('--push-interval', type=float, default=0, help="seconds between pushed volume changes, 0 to disable")
+    parser.add_argument('--disconnect-interval', type=float, default=0, help="seconds between disconnects, 0 to disable")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    simulator = Simulator(args.model, args.host, args.port, args.latency, args.jitter, args.fragment,
+                          args.push_interval, args.disconnect_interval, args.seed)
+    try:
+        asyncio.run(simulator.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
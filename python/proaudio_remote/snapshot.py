@@ -0,0 +1,45 @@
+import time
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+class ZoneSnapshot():
+    """ values of a single zone at the time of the snapshot """
+    def __init__(self, zone):
+        self.zone = zone.zone
+        self.name = repr(zone)
+        self.values = {}
+        for val in zone.values:
+            self.values[val.name] = val.last_value
+
+    def get(self, name, default=None):
+        return self.values.get(name, default)
+
+    def __repr__(self):
+        return "{}: {}".format(self.name, str(self.values))
+
+class Snapshot():
+    """ state of all zones of a switch """
+    def __init__(self, remote):
+        self.time = time.time()
+        self.model = remote.model
+        self.version = remote.version
+        self.serial = remote.serial
+        self.inputs = [ZoneSnapshot(bay) for bay in remote.inputs if len(bay.values) > 0]
+        self.outputs = [ZoneSnapshot(bay) for bay in remote.outputs]
+
+    def input(self, name):
+        """ snapshot of the input with the given name """
+        return _find(self.inputs, name)
+
+    def output(self, name):
+        """ snapshot of the output with the given name """
+        return _find(self.outputs, name)
+
+    def __repr__(self):
+        return "model:{} version:{} serial:{} inputs:{} outputs:{}".format(self.model, self.version, self.serial, len(self.inputs), len(self.outputs))
+
+def _find(zones, name):
+    for zone in zones:
+        if zone.name == name:
+            return zone
+    return None
@@ -0,0 +1,44 @@
+from array import array
+import time
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+_UNSET = float('nan')
+
+class StateTable():
+    """ Cached values of all zone values of a switch, stored in columns indexed by slot.
+        Each ZoneValue is a view on one slot. Refresh times are stored in an array, unset refresh
+        times are NaN. Changed values are tracked per slot until they're taken by take_changes(). """
+    def __init__(self):
+        self.owners = []
+        self.values = []
+        self.last_refresh = array('d')
+        # {slot: (value before the first change, time of the last change)}
+        self.changes = {}
+
+    def __len__(self):
+        return len(self.owners)
+
+    def allocate(self, owner):
+        """ add a slot for a zone value, returns its index """
+        self.owners.append(owner)
+        self.values.append(None)
+        self.last_refresh.append(_UNSET)
+        return len(self.owners) - 1
+
+    def reset(self, slot):
+        self.values[slot] = None
+        self.last_refresh[slot] = _UNSET
+        self.changes.pop(slot, None)
+
+    def changed(self, slot, old):
+        """ the value of slot was changed from old """
+        change = self.changes.get(slot)
+        self.changes[slot] = ((old if (change is None) else change[0]), time.time())
+
+    def take_changes(self):
+        """ {slot: (old value, time)} of all values that were changed since the last call """
+        # replaced instead of cleared, so changes from other threads end up in the next batch
+        changes = self.changes
+        self.changes = {}
+        return changes
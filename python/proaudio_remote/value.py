@@ -1,39 +1,200 @@
 import time
 import logging
+from .state import *
+from .commands import *
 _LOGGER = logging.getLogger(__name__)
 
+def decode_int(value):
+    """ int value of a response, or None if it isn't a number """
+    digits = value[1:] if (value[:1] in ('-', '+')) else value
+    return int(value) if digits.isdigit() else None
+
 class ZoneValue():
-    def __init__(self, name, refresh_cmd, refresh_param=None, refresh_time=30):
+    """ Cached value of a zone, read with "^CMD @zone?$" and changed with "^CMD @zone,value$".
+        The value itself is stored in the StateTable of the remote, this is a view on its slot. """
+    __slots__ = ('name', 'cmd', 'decode', 'encode', 'zone', 'timeout', '_state', '_slot', '_query', '_prefix')
+
+    def __init__(self, name, cmd, decode=None, encode=str, refresh_time=30):
         self.name = name
-        self.cmd = refresh_cmd
-        self.cmd_param = refresh_param
+        self.cmd = cmd
+        self.decode = decode
+        self.encode = encode
+        self.zone = None
         self.timeout = refresh_time
-        self.reset()
+        self._state = None
+        self._slot = None
+        # command bytes, created the first time they're used
+        self._query = None
+        self._prefix = None
+
+    def bind(self, zone, state):
+        """ attach this value to a zone and allocate its slot in the state table """
+        self.zone = zone
+        self._state = state
+        self._slot = state.allocate(self)
+
+    @property
+    def last_value(self):
+        return self._state.values[self._slot]
+
+    @property
+    def last_refresh(self):
+        last = self._state.last_refresh[self._slot]
+        # NaN if the value was never refreshed
+        return None if (last != last) else last
+
+    @property
+    def key(self):
+        """ (command, zone) that the response to this value's commands is matched with """
+        return (self.cmd, self.zone.zonefmt)
+
+    @property
+    def query(self):
+        """ command that reads this value from the switch """
+        if self._query is None:
+            self._query = query_command(self.cmd, self.zone.zonefmt)
+        return self._query
+
+    def command(self, value):
+        """ command that changes this value on the switch """
+        if self._prefix is None:
+            self._prefix = command_prefix(self.cmd, self.zone.zonefmt)
+        return build_command(self._prefix, value)
+
+    @property
+    def expired(self):
+        """ True if the cached value has to be refreshed before it can be used """
+        return (self.last_refresh is None) or ((time.time() - self.last_refresh) >= self.timeout)
 
     def poll(self):
         if self.timeout > 0:
             last_value = self.last_value
             value = self.get()
-            return ((last_value is None) and (value is not None)) or ((last_value is not None) and (last_value != value))
+            return self._changed(last_value, value)
+        return False
+
+    async def async_poll(self):
+        if self.timeout > 0:
+            last_value = self.last_value
+            value = await self.async_get()
+            return self._changed(last_value, value)
         return False
 
     def reset(self):
-        self.last_refresh = None
-        self.last_value = None
+        self._state.reset(self._slot)
 
     def get(self):
-        now = time.time()
-        if (self.last_refresh is None) or ((now - self.last_refresh) >= self.timeout): 
-            self.last_refresh = now
-            if self.cmd_param is None:
-                self.last_value = self.cmd()
-            else:
-                self.last_value = self.cmd(self.cmd_param)
+        # remotes that can't block only return the cached value, it's refreshed by async_get().
+        # values restored from the cache are returned while the switch isn't connected
+        if self.expired and self.zone._conn.blocking and ((self.last_value is None) or self.zone._conn.connected):
+            self._state.last_refresh[self._slot] = time.time()
+            self.set(self.refresh())
+        return self.last_value
+
+    async def async_get(self):
+        if self.expired:
+            self._state.last_refresh[self._slot] = time.time()
+            self.set(await self.async_refresh())
         return self.last_value
 
+    def refresh(self):
+        """ read the value from the switch """
+        return self._decode(self.zone._conn.send_command(self.query, self.key).zone_resp())
+
+    async def async_refresh(self):
+        """ read the value from the switch """
+        return self._decode((await self.zone._conn.async_send_command(self.query, self.key)).zone_resp())
+
+    def update(self, resp):
+        """ store the value from the response to query, returns True if it changed """
+        return self.update_value(resp.zone_resp())
+
+    def update_value(self, value):
+        """ store a value that was received from the switch, returns True if it changed """
+        last_value = self.last_value
+        self.set(self._decode(value))
+        return self._changed(last_value, self.last_value)
+
     def set(self, value):
-        self.last_refresh = time.time()
-        self.last_value = value
+        """ store a value, changes are reported once per poll cycle or by the setter that changed it """
+        last_value = self._state.values[self._slot]
+        self._state.last_refresh[self._slot] = time.time()
+        self._state.values[self._slot] = value
+        if self._changed(last_value, value):
+            self._state.changed(self._slot, last_value)
+
+    def encoded(self):
+        """ the cached value like the switch returns it, or None if it's not set or can't be converted back """
+        value = self.last_value
+        if value is None:
+            return None
+        try:
+            rv = str(self.encode(value))
+            return rv if (self._decode(rv) == value) else None
+        except Exception:
+            return None
+
+    def restore(self, value):
+        """ store a value like the switch returns it, without refresh time so it's refreshed before it's used """
+        self._state.values[self._slot] = self._decode(value)
+
+    def set_encoded(self, value):
+        """ update the cached value after the encoded value was written to the switch """
+        self._store_written(self._decode(str(value)))
+
+    def write(self, value):
+        """ change the value on the switch and update the cached value """
+        rv = self.zone._conn.send_command(self.command(self.encode(value)), self.key)
+        if rv is not None:
+            self._written(rv, value)
+            self.zone._conn._values_changed()
+        return rv
+
+    async def async_write(self, value):
+        """ change the value on the switch and update the cached value """
+        rv = await self.zone._conn.async_send_command(self.command(self.encode(value)), self.key)
+        if rv is not None:
+            self._written(rv, value)
+            self.zone._conn._values_changed()
+        return rv
+
+    def _written(self, rv, value):
+        # the switch returns the new value, which is also the result of relative changes like "+"
+        resp = rv.zone_resp()
+        self._store_written(self._decode(resp) if (resp is not None) else value)
+
+    def _shared(self):
+        # analog and digital outputs with the same number share settings like the volume, a write changes all of them
+        return self.zone._conn._update_values(self.cmd, self.zone.zonefmt) or [self]
+
+    def _store_written(self, value):
+        for val in self._shared():
+            val.set(value)
+
+    def _reset_written(self):
+        # the value is unknown after a write failed, it's read from the switch again
+        for val in self._shared():
+            val.reset()
+
+    def queue_write(self, value):
+        """ change the value on the switch with the next flush of the remote's write coalescer.
+            the cached value is updated right away, earlier values that weren't sent yet are dropped """
+        encoded = self.encode(value)
+        self.zone._conn.queue_write(self, value, self.command(encoded))
+        # cache the value like the switch stores it, the equaliser for example is changed in steps of 0.5 dB.
+        # relative changes like "+" are cached when the switch returns the new value
+        stored = self._decode(str(encoded))
+        if stored is not None:
+            self._store_written(stored)
+            self.zone._conn._values_changed()
+
+    def _decode(self, value):
+        if (value is None) or (self.decode is None):
+            return value
+        return self.decode(value)
+
+    def _changed(self, last_value, value):
+        return ((last_value is None) and (value is not None)) or ((last_value is not None) and (last_value != value))
 
     def __repr__(self):
         return "{}: {}".format(self.name, str(self.last_value))
@@ -1,17 +1,37 @@
 import logging
+from .state import *
 _LOGGER = logging.getLogger(__name__)
 
 class AudioZone():
     """ Audio input or output zone """
+    # zone number offset of zones of this kind and their name, formatted with the 1 based index
+    _zone_offset = 0
+    _zone_name = "unknown zone {}"
+
     def __init__(self, nb, conn=None):
-        self._nb = nb
+        self._nb = nb + self._zone_offset
+        self._zonefmt = "{0:03d}".format(int(self._nb))
         self._conn = conn
+        self._state = conn.state if (conn is not None) else StateTable()
         self._values = []
 
     def register_value(self, value):
+        value.bind(self, self._state)
         self._values.append(value)
         return value
 
+    @property
+    def values(self):
+        """ all values of this zone """
+        return self._values
+
+    def value(self, name):
+        """ get the ZoneValue with the given name """
+        for val in self._values:
+            if val.name == name:
+                return val
+        raise KeyError(name)
+
     def poll(self):
         changed = False
         for val in self._values:
@@ -19,6 +39,25 @@ class AudioZone():
                 changed = True
         return changed
 
+    async def async_poll(self):
+        changed = False
+        for val in self._values:
+            if await val.async_poll():
+                changed = True
+        return changed
+
+    async def async_get(self, name):
+        """ read a value by name, refreshing it from the switch if needed """
+        return await self.value(name).async_get()
+
+    async def async_set(self, name, value):
+        """ change a value by name on the switch """
+        return await self.value(name).async_write(value)
+
+    def queue_set(self, name, value):
+        """ change a value by name with the next flush of the write coalescer, without waiting for the switch """
+        self.value(name).queue_write(value)
+
     @property
     def connected(self):
         """ check if the zone can be accessed """
@@ -32,7 +71,7 @@ class AudioZone():
     @property
     def zonefmt(self):
         """ zone number returned by the switch commands (3 digits) """
-        return "{0:03d}".format(self.zone)
+        return self._zonefmt
 
     @property
     def is_analog(self):
@@ -52,19 +91,34 @@ class AudioZone():
         if self._conn is not None:
             self._conn.on_zone_updated(self)
 
+    @classmethod
+    def zone_number(cls, nb):
+        """ zone number of the zone of this kind with the given 1 based index """
+        return nb + cls._zone_offset
+
+    @classmethod
+    def zone_name(cls, nb):
+        """ name of the zone of this kind with the given 1 based index """
+        return cls._zone_name.format(nb)
+
     def __repr__(self):
-        return "unknown zone {}".format(str(self.zone))
+        return self._zone_name.format(str(self._nb - self._zone_offset))
 
     def __str__(self):
         return self.zonefmt
 
 class AudioZoneDisconnected(AudioZone):
     """ Disconnected audio source (no audio routed to the output) """
+    _zone_name = "disconnected"
 
     def __init__(self, digital):
         super().__init__(0)
         self._digital = digital
 
+    @classmethod
+    def zone_number(cls, nb):
+        return 0
+
     @property
     def is_analog(self):
         """ True if this is an analog input """
@@ -80,6 +134,3 @@ class AudioZoneDisconnected(AudioZone):
         """ Get the current gain setting for this input """
         return 0
 
-    def __repr__(self):
-        return "disconnected"
-
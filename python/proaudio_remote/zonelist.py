@@ -0,0 +1,77 @@
+from collections.abc import Sequence
+import threading
+import logging
+_LOGGER = logging.getLogger(__name__)
+
+class ZoneSegment():
+    """ `count` zones of the same kind, created with factory(nb) (nb is 1 based) the first time they're used.
+        created(zone) is called once a zone was created and can be found with peek() """
+    def __init__(self, count, kind, factory, created=None):
+        self.kind = kind
+        self._factory = factory
+        self._created = created
+        self._zones = [None] * count
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._zones)
+
+    def get(self, pos):
+        zone = self._zones[pos]
+        if zone is None:
+            with self._lock:
+                zone = self._zones[pos]
+                if zone is None:
+                    zone = self._factory(pos + 1)
+                    self._zones[pos] = zone
+                    if self._created is not None:
+                        self._created(zone)
+        return zone
+
+    def peek(self, pos):
+        """ the zone at pos, or None if it wasn't created yet """
+        return self._zones[pos]
+
+    def materialized(self):
+        """ zones that were created """
+        return [zone for zone in self._zones if zone is not None]
+
+class LazyZoneList(Sequence):
+    """ list of zones that are only created when they're accessed. multiple lists can share the same segments """
+    def __init__(self, segments):
+        self._segments = segments
+
+    def __len__(self):
+        return sum(len(segment) for segment in self._segments)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[pos] for pos in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for segment in self._segments:
+                if index < len(segment):
+                    return segment.get(index)
+                index -= len(segment)
+        raise IndexError("zone index out of range")
+
+    def __iter__(self):
+        for segment in self._segments:
+            pos = 0
+            while pos < len(segment):
+                yield segment.get(pos)
+                pos += 1
+
+    def __add__(self, other):
+        return list(self) + list(other)
+
+    def materialized(self):
+        """ zones in this list that were created """
+        rv = []
+        for segment in self._segments:
+            rv.extend(segment.materialized())
+        return rv
+
+    def __repr__(self):
+        return "LazyZoneList({} zones, {} created)".format(len(self), len(self.materialized()))
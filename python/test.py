@@ -1,4 +1,5 @@
 import proaudio_remote as p8
+import sys
 import time
 
 class TestCallbacks(p8.RemoteCallbacks):
@@ -20,7 +21,9 @@ def test(remote):
     print(str(zone.dump()))
 
 cbs = TestCallbacks()
-remote = p8.Remote("proaudio.p8.dmb.opdenkamp.eu", callbacks=cbs)
+# address and port of the switch, like "localhost 50006" for python3 -m proaudio_remote.simulator --port 50006
+remote = p8.Remote(sys.argv[1] if (len(sys.argv) > 1) else "proaudio.p8.dmb.opdenkamp.eu", callbacks=cbs,
+                   port=int(sys.argv[2]) if (len(sys.argv) > 2) else 50005)
 while not remote.connected:
     time.sleep(1)
 test(remote)
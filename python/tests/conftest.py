@@ -0,0 +1,73 @@
+# Fixtures for the tests, run from the python directory with: python3 -m pytest tests
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from proaudio_remote.simulator import Simulator
+
+class SimulatorThread():
+    """ Simulator running on an event loop in a background thread, for the threaded Remote """
+    def __init__(self, **kwargs):
+        self.simulator = Simulator(port=0, **kwargs)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self.call(self.simulator.start())
+
+    @property
+    def port(self):
+        return self.simulator.port
+
+    @property
+    def switch(self):
+        return self.simulator.switch
+
+    def call(self, coro):
+        """ run a coroutine on the simulator's event loop and return its result """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(10)
+
+    def run(self, func, *args):
+        """ call a function on the simulator's event loop """
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def close(self):
+        self.call(self.simulator.close())
+        self.call(self._cancel_tasks())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(5)
+        self.loop.close()
+
+    async def _cancel_tasks(self):
+        # connections that are still waiting for the latency of a command
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+@pytest.fixture
+def simulator():
+    sim = SimulatorThread()
+    yield sim
+    sim.close()
+
+def wait_for(condition, timeout=5):
+    """ wait until condition() returns True, fails the test on a timeout """
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            pytest.fail("timed out waiting for a condition")
+        time.sleep(0.005)
+
+async def async_wait_for(condition, timeout=5):
+    """ wait_for() on an event loop """
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            pytest.fail("timed out waiting for a condition")
+        await asyncio.sleep(0.005)
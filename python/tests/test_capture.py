@@ -0,0 +1,57 @@
+import pytest
+from proaudio_remote import *
+from conftest import wait_for
+
+def _values(snapshot):
+    # sources are zones of the remote that made the snapshot, they're compared by name
+    return [(zone.name, repr(zone.values)) for zone in snapshot.inputs + snapshot.outputs]
+
+def test_replay_round_trip(simulator, tmp_path):
+    path = str(tmp_path / 'switch.cap')
+    simulator.switch.set('VPZ', 2, '70')
+    simulator.switch.set('EQ3Z', 5, '140')
+    remote = Remote("127.0.0.1", port=simulator.port, capture_file=path)
+    try:
+        wait_for(lambda: remote.ready)
+        recorded = remote.refresh_all()
+    finally:
+        remote.close()
+
+    transport = ReplayTransport(path, speed=0, idle_timeout=1)
+    replayed = Remote("replay", transport=transport, blocking=False, max_poll_rate=1000)
+    try:
+        wait_for(lambda: replayed.ready)
+        for cmd, zone in transport.keys:
+            replayed._update_values(cmd, zone, True)
+        assert transport.wait(10)
+        # the last responses were sent, they may not be processed yet
+        wait_for(lambda: _values(replayed.snapshot()) == _values(recorded))
+        assert transport.mismatches == 0
+        assert replayed.stats()['timeouts'] == 0
+        assert replayed.outputs[1].volume == 70
+        assert replayed.outputs[4].eq[2] == 6.0
+    finally:
+        replayed.close()
+
+def test_replay_rejects_commands_that_werent_recorded(simulator, tmp_path):
+    path = str(tmp_path / 'switch.cap')
+    remote = Remote("127.0.0.1", port=simulator.port, capture_file=path)
+    try:
+        wait_for(lambda: remote.ready)
+        remote.send_command("^VPZ @001?$")
+    finally:
+        remote.close()
+
+    transport = ReplayTransport(path, speed=0, idle_timeout=1)
+    replayed = Remote("replay", transport=transport)
+    try:
+        wait_for(lambda: replayed.ready)
+        assert replayed.send_command("^VPZ @001?$").zone_resp() == '50'
+        # answered like the recorded command for the same zone
+        assert replayed.send_command("^VPZ @001,60$").zone_resp() == '50'
+        with pytest.raises(CommandRejected):
+            replayed.send_command("^VPZ @002?$")
+    finally:
+        replayed.close()
+    transport.wait(5)
+    assert transport.mismatches == 2
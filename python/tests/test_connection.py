@@ -0,0 +1,113 @@
+import asyncio
+import time
+import pytest
+from proaudio_remote import *
+from proaudio_remote.simulator import Simulator
+from conftest import wait_for
+
+@pytest.fixture
+def remote(simulator):
+    remote = Remote("127.0.0.1", port=simulator.port)
+    wait_for(lambda: remote.ready)
+    yield remote
+    remote.close()
+
+def test_deadline_later_than_the_socket_timeout(simulator, remote):
+    simulator.simulator.latency = 1.5
+    assert remote.send_command("^VPZ @001?$", timeout=4).zone_resp() == '50'
+    assert remote.connected
+
+def test_timeout_keeps_the_connection(simulator, remote):
+    simulator.simulator.latency = 1
+    start = time.monotonic()
+    with pytest.raises(CommandTimeout):
+        remote.send_command("^VPZ @001?$", timeout=0.3)
+    assert time.monotonic() - start < 0.9
+    # the late response is matched to the command that timed out
+    simulator.switch.set('VPZ', 1, '60')
+    simulator.simulator.latency = 0
+    assert remote.send_command("^VPZ @001?$").zone_resp() == '60'
+    assert remote.connected
+    assert remote.stats()['disconnects'] == 0
+
+def test_rejected_command(remote):
+    with pytest.raises(CommandRejected):
+        remote.send_command("^VPZ @099?$")
+    assert remote.send_command("^VPZ @001?$").zone_resp() == '50'
+
+class _Callback(ConnectionCallback):
+    def on_connected(self):
+        return True
+
+def test_cancel_queued(simulator):
+    conn = Connection(_Callback(), "127.0.0.1", simulator.port, pipeline_depth=1)
+    try:
+        wait_for(lambda: conn.connected)
+        simulator.simulator.latency = 0.2
+        futures = [conn.submit_threadsafe("^VPZ @00{}?$".format(zone)) for zone in range(1, 4)]
+        # one command in flight, the others are queued
+        wait_for(lambda: conn._pipeline.inflight > 0)
+        assert conn.cancel_queued() == 2
+        assert futures[0].result(5).zone_resp() == '50'
+        for future in futures[1:]:
+            with pytest.raises(CommandCancelled):
+                future.result()
+    finally:
+        conn.close()
+
+class _BusyCallback(_Callback):
+    def __init__(self):
+        self.conn = None
+        self.busy = 0
+
+    def poll(self):
+        if self.conn is not None:
+            try:
+                self.conn.send_many(["^VPZ @001?$"], timeout=0.1)
+            except CommandTimeout:
+                self.busy += 1
+                raise
+
+    def next_poll(self):
+        return 0.05
+
+def test_busy_connection_isnt_dropped(simulator):
+    callback = _BusyCallback()
+    conn = Connection(callback, "127.0.0.1", simulator.port)
+    try:
+        wait_for(lambda: conn.connected)
+        simulator.simulator.latency = 0.3
+        callback.conn = conn
+        # the polls of the connection thread can't get the lock while this batch is sent
+        futures = conn.send_many(["^VPZ @00{}?$".format(zone) for zone in range(2, 5)])
+        callback.conn = None
+        assert [f.result().zone_resp() for f in futures] == ['50'] * 3
+        assert callback.busy > 0
+        time.sleep(0.2)
+        assert conn.connected
+        assert conn.metrics.disconnects == 0
+    finally:
+        conn.close()
+
+def test_async_timeout_and_cancellation():
+    async def run():
+        simulator = Simulator(port=0)
+        await simulator.start()
+        remote = AsyncRemote("127.0.0.1", port=simulator.port)
+        try:
+            assert await remote.async_connect()
+            simulator.latency = 0.5
+            with pytest.raises(CommandTimeout):
+                await remote.async_send_command("^VPZ @001?$", timeout=0.1)
+            task = asyncio.ensure_future(remote.async_send_many(["^VPZ @00{}?$".format(zone) for zone in range(1, 9)]))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            simulator.latency = 0
+            assert (await remote.async_send_command("^VPZ @002?$", timeout=5)).zone_resp() == '50'
+            assert remote.connected
+        finally:
+            await remote.async_close()
+            await simulator.close()
+    asyncio.run(run())
@@ -0,0 +1,40 @@
+from proaudio_remote.framer import *
+
+def _frames(rx):
+    return [bytes(frame) for frame in rx.frames()]
+
+def test_coalesced_frames():
+    rx = FrameBuffer()
+    rx.feed(b'^+$\r\n^=VPZ @001,50$\r\n^+$\r\n^=VMZ @001,0$\r\n')
+    assert _frames(rx) == [b'^+$', b'^=VPZ @001,50$', b'^+$', b'^=VMZ @001,0$']
+    assert _frames(rx) == []
+
+def test_split_frames():
+    rx = FrameBuffer()
+    data = b'^+$\r\n^=VPZ @001,50$\r\n'
+    rv = []
+    for pos in range(len(data)):
+        rx.feed(data[pos:pos + 1])
+        rv.extend(_frames(rx))
+    assert rv == [b'^+$', b'^=VPZ @001,50$']
+
+def test_incomplete_frame_is_kept():
+    rx = FrameBuffer()
+    rx.feed(b'^=VPZ @001,50$\r\n^=VPZ @0')
+    assert _frames(rx) == [b'^=VPZ @001,50$']
+    assert len(rx) > 0
+    rx.feed(b'02,40$')
+    assert _frames(rx) == [b'^=VPZ @002,40$']
+
+def test_garbage_before_a_frame_is_skipped():
+    rx = FrameBuffer()
+    rx.feed(b'noise^^=VPZ @001,50$')
+    assert _frames(rx) == [b'^=VPZ @001,50$']
+
+def test_buffer_grows_for_large_frames():
+    rx = FrameBuffer(size=16)
+    frame = b'^=V "' + b'x' * 100 + b'",1.0,SN1$'
+    rx.feed(frame[:50])
+    assert _frames(rx) == []
+    rx.feed(frame[50:])
+    assert _frames(rx) == [frame]
@@ -0,0 +1,52 @@
+import asyncio
+from proaudio_remote import *
+from proaudio_remote.simulator import Simulator
+from conftest import async_wait_for
+
+def test_switches_on_the_same_address():
+    async def run():
+        simulators = [Simulator(port=0), Simulator(port=0)]
+        for simulator in simulators:
+            await simulator.start()
+        simulators[1].switch.set('VPZ', 1, '20')
+        manager = RemoteManager()
+        remotes = [manager.add("127.0.0.1", port=simulator.port) for simulator in simulators]
+        try:
+            assert remotes[0] is not remotes[1]
+            assert manager.add("127.0.0.1", port=simulators[0].port) is remotes[0]
+            manager.start()
+            await async_wait_for(lambda: all(remote.ready for remote in remotes))
+            bays = [remote.outputs[0] for remote in remotes]
+            await async_wait_for(lambda: None not in [bay.volume for bay in bays])
+            assert [bay.volume for bay in bays] == [50, 20]
+            await manager.async_remove("127.0.0.1", simulators[0].port)
+            assert list(manager.remotes) == [("127.0.0.1", simulators[1].port)]
+        finally:
+            await manager.async_close()
+            for simulator in simulators:
+                await simulator.close()
+    asyncio.run(run())
+
+def test_slow_switch_doesnt_delay_the_others():
+    async def run():
+        simulators = [Simulator(port=0), Simulator(port=0)]
+        for simulator in simulators:
+            await simulator.start()
+        manager = RemoteManager()
+        slow, fast = [manager.add("127.0.0.1", port=simulator.port) for simulator in simulators]
+        try:
+            manager.start()
+            await async_wait_for(lambda: slow.ready and fast.ready)
+            simulators[0].latency = 3
+            commands = simulators[0].commands
+            slow.outputs[0]
+            # the manager is polling the slow switch now
+            await async_wait_for(lambda: simulators[0].commands > commands)
+            bay = fast.outputs[0]
+            await async_wait_for(lambda: bay.volume is not None, timeout=1.5)
+            assert slow.outputs[0].volume is None
+        finally:
+            await manager.async_close()
+            for simulator in simulators:
+                await simulator.close()
+    asyncio.run(run())
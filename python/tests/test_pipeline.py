@@ -0,0 +1,90 @@
+import concurrent.futures
+import pytest
+from proaudio_remote.pipeline import *
+
+def _submit(pipeline, cmd, deadline=None):
+    return pipeline.submit(cmd, concurrent.futures.Future(), deadline=deadline).future
+
+def test_responses_are_matched_by_command_and_zone():
+    pipeline = CommandPipeline()
+    volume = _submit(pipeline, "^VPZ @001?$")
+    mute = _submit(pipeline, "^VMZ @001?$")
+    assert len(pipeline.next_to_send()) == 2
+    assert pipeline.process_frame(b'^+$')
+    assert pipeline.process_frame(b'^+$')
+    # responses of pipelined commands can be returned in another order
+    assert pipeline.process_frame(b'^=VMZ @001,1$')
+    assert pipeline.process_frame(b'^=VPZ @001,40$')
+    assert volume.result().zone_resp() == '40'
+    assert mute.result().zone_resp() == '1'
+    assert not pipeline.busy
+
+def test_updates_are_not_matched():
+    pipeline = CommandPipeline()
+    volume = _submit(pipeline, "^VPZ @001?$")
+    pipeline.next_to_send()
+    # the response to a command is only matched after its ^+$
+    assert not pipeline.process_frame(b'^=VPZ @001,40$')
+    assert pipeline.process_frame(b'^+$')
+    assert not pipeline.process_frame(b'^=VPZ @002,40$')
+    assert not volume.done()
+
+def test_window_limits_commands_in_flight():
+    pipeline = CommandPipeline(depth=2)
+    futures = [_submit(pipeline, "^VPZ @00{}?$".format(zone)) for zone in range(1, 5)]
+    assert len(pipeline.next_to_send()) == 2
+    assert pipeline.next_to_send() == []
+    pipeline.process_frame(b'^+$')
+    pipeline.process_frame(b'^=VPZ @001,1$')
+    assert [p.key for p in pipeline.next_to_send()] == [('VPZ', '003')]
+    assert futures[0].done() and not futures[2].done()
+
+def test_rejected_command():
+    pipeline = CommandPipeline()
+    volume = _submit(pipeline, "^VPZ @009?$")
+    mute = _submit(pipeline, "^VMZ @001?$")
+    pipeline.next_to_send()
+    assert pipeline.process_frame(b'^!$')
+    with pytest.raises(CommandRejected):
+        volume.result()
+    pipeline.process_frame(b'^+$')
+    pipeline.process_frame(b'^=VMZ @001,0$')
+    assert mute.result().zone_resp() == '0'
+
+def test_expired_command_keeps_late_response():
+    pipeline = CommandPipeline(grace=1)
+    late = _submit(pipeline, "^VPZ @001?$", deadline=10)
+    pipeline.next_to_send()
+    assert pipeline.expire(now=10) == 1
+    with pytest.raises(CommandTimeout):
+        late.result()
+    assert pipeline.busy and not pipeline.waiting
+    volume = _submit(pipeline, "^VPZ @001?$", deadline=20)
+    pipeline.next_to_send()
+    # the late response belongs to the expired command, not to the new one with the same key
+    pipeline.process_frame(b'^+$')
+    pipeline.process_frame(b'^=VPZ @001,1$')
+    assert not volume.done()
+    pipeline.process_frame(b'^+$')
+    pipeline.process_frame(b'^=VPZ @001,2$')
+    assert volume.result().zone_resp() == '2'
+
+def test_expired_command_is_abandoned_after_grace():
+    pipeline = CommandPipeline(grace=1)
+    _submit(pipeline, "^VPZ @001?$", deadline=10)
+    pipeline.next_to_send()
+    pipeline.expire(now=10)
+    assert pipeline.inflight == 1
+    pipeline.expire(now=11)
+    assert pipeline.inflight == 0
+    assert not pipeline.busy
+
+def test_cancel_queued():
+    pipeline = CommandPipeline(depth=1)
+    sent = _submit(pipeline, "^VPZ @001?$")
+    queued = _submit(pipeline, "^VPZ @002?$")
+    pipeline.next_to_send()
+    assert pipeline.cancel_queued() == 1
+    with pytest.raises(CommandCancelled):
+        queued.result()
+    assert not sent.done()
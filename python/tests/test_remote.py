@@ -0,0 +1,172 @@
+import asyncio
+import json
+import pytest
+import time
+from proaudio_remote import *
+from proaudio_remote.simulator import Simulator
+from conftest import wait_for, async_wait_for
+
+def test_non_blocking_first_load(simulator):
+    simulator.switch.set('SZ', 1, '003')
+    simulator.switch.set('EQ2Z', 1, '132')
+    simulator.switch.set('LSZ', 1, '96')
+    remote = Remote("127.0.0.1", port=simulator.port, blocking=False)
+    try:
+        wait_for(lambda: remote.ready)
+        bay = remote.outputs[0]
+        # values that aren't polled are read once, without a blocking read by the caller
+        wait_for(lambda: (bay.switch is not None) and (bay.delay is not None) and (None not in bay.eq), timeout=2)
+        assert repr(bay.switch) == "analog input 3"
+        assert bay.eq[1] == 2.0
+        assert bay.delay == 96
+        wait_for(lambda: remote.inputs[0].gain is not None, timeout=2)
+    finally:
+        remote.close()
+
+def test_new_zones_are_read_in_a_burst(simulator):
+    remote = Remote("127.0.0.1", port=simulator.port, blocking=False, max_poll_rate=5)
+    try:
+        wait_for(lambda: remote.ready)
+        values = [val for nb in range(4) for val in remote.outputs[nb].values]
+        # far more values than the poll rate allows per second
+        assert len(values) > 20
+        wait_for(lambda: None not in [val.last_value for val in values], timeout=1.5)
+    finally:
+        remote.close()
+
+def test_cache_only_reads_dont_send_commands(simulator):
+    remote = Remote("127.0.0.1", port=simulator.port, blocking=False)
+    try:
+        wait_for(lambda: remote.ready)
+        bay = remote.outputs[0]
+        wait_for(lambda: bay.volume is not None)
+        commands = simulator.simulator.commands
+        for _ in range(100):
+            bay.volume
+            bay.bass
+        assert simulator.simulator.commands == commands
+    finally:
+        remote.close()
+
+def test_setter_changes_are_reported_right_away(simulator):
+    remote = Remote("127.0.0.1", port=simulator.port)
+    try:
+        wait_for(lambda: remote.ready)
+        bay = remote.outputs[0]
+        events = []
+        remote.subscribe(events.extend, attributes=["volume"])
+        assert bay.volume == 50
+        # the first read is reported too
+        wait_for(lambda: len(events) > 0)
+        del events[:]
+        bay.volume = 7
+        wait_for(lambda: len(events) > 0, timeout=1)
+        assert (events[0].zone, events[0].attribute, events[0].old, events[0].new) == (bay, 'volume', 50, 7)
+    finally:
+        remote.close()
+
+def test_queued_writes_cache_the_encoded_value(simulator):
+    # the writes are queued well within the write interval
+    remote = Remote("127.0.0.1", port=simulator.port, write_interval=0.5)
+    try:
+        wait_for(lambda: remote.ready)
+        bay = remote.outputs[0]
+        # the first read of the zone doesn't overlap with the writes
+        wait_for(lambda: None not in [val.last_value for val in bay.values])
+        # the first write after a pause is sent right away, the next ones wait for the write interval
+        bay.queue_set('volume', 5)
+        wait_for(lambda: simulator.switch.get('VPZ', 1) == '5')
+        for volume in range(10, 20):
+            bay.queue_set('volume', volume)
+        bay.queue_set('eq1', 9.9)
+        # the switch changes the equaliser in steps of 0.5 dB
+        assert bay.value('eq1').last_value == 10.0
+        wait_for(lambda: simulator.switch.get('EQ1Z', 1) == '148', timeout=2)
+        assert simulator.switch.get('VPZ', 1) == '19'
+        assert remote.dropped_writes == 9
+    finally:
+        remote.close()
+
+def test_writes_change_the_outputs_that_share_a_value(simulator, tmp_path):
+    cache_file = str(tmp_path / "cache.json")
+    remote = Remote("127.0.0.1", port=simulator.port, cache_file=cache_file)
+    try:
+        wait_for(lambda: remote.ready)
+        analog, digital = remote.outputs_analog[2], remote.outputs_digital[2]
+        assert (analog.volume, digital.volume) == (50, 50)
+        analog.volume = 33
+        assert digital.volume == 33
+        remote.save_cache()
+        assert StateCache(cache_file).load()[1][('VPZ', analog.zonefmt)] == '33'
+    finally:
+        remote.close()
+
+def test_invalid_cache_files_are_discarded(tmp_path):
+    cache_file = tmp_path / "cache.json"
+    for data in ([1, 2], "ProAudio8", None):
+        cache_file.write_text(json.dumps(data))
+        assert StateCache(str(cache_file)).load() is None
+
+def test_failed_values_are_retried_with_a_backoff(simulator):
+    execute = simulator.switch.execute
+    rejected = []
+    def reject_volume(body):
+        if body.startswith('VPZ @001'):
+            rejected.append(time.monotonic())
+            return ['^!$']
+        return execute(body)
+    simulator.switch.execute = reject_volume
+    remote = Remote("127.0.0.1", port=simulator.port, blocking=False)
+    try:
+        wait_for(lambda: remote.ready)
+        remote.outputs[0]
+        time.sleep(2.5)
+        # retried after 1 and 2 seconds instead of at the poll rate
+        assert 2 <= len(rejected) <= 3
+        assert remote.connected
+    finally:
+        remote.close()
+
+def test_blocking_and_async_batches(simulator):
+    remote = Remote("127.0.0.1", port=simulator.port)
+    try:
+        wait_for(lambda: remote.ready)
+        bay = remote.outputs[0]
+        assert bay.apply_eq([2.0, None, None, None, None]) == []
+        assert asyncio.run(bay.async_apply_eq([None, 2.0, None, None, None])) == []
+        assert (simulator.switch.get('EQ1Z', 1), simulator.switch.get('EQ2Z', 1)) == ('132', '132')
+        preset = remote.capture_preset()
+        bay.volume = 10
+        assert remote.apply_preset(preset).commands == 1
+        remote.outputs[1].volume = 10
+        assert asyncio.run(remote.async_apply_preset(preset)).commands == 1
+        assert (simulator.switch.get('VPZ', 1), simulator.switch.get('VPZ', 2)) == ('50', '50')
+        simulator.simulator.latency = 1
+        # commands that fail are reported per value, in both versions
+        with pytest.raises(CommandTimeout):
+            remote.send_command("^VPZ @001?$", timeout=0.1)
+        remote._conn.command_timeout = 0.2
+        assert bay.apply_eq([5.0, None, None, None, None]) == [1]
+        assert asyncio.run(bay.async_apply_eq([None, 5.0, None, None, None])) == [2]
+    finally:
+        remote.close()
+
+def test_async_remote_reads_new_zones_right_away():
+    async def run():
+        simulator = Simulator(port=0)
+        await simulator.start()
+        remote = AsyncRemote("127.0.0.1", port=simulator.port)
+        remote.start()
+        try:
+            await async_wait_for(lambda: remote.ready)
+            first = remote.outputs[0]
+            await async_wait_for(lambda: None not in [val.last_value for val in first.values])
+            # the poll task waits for the next refresh of the polled values now
+            await asyncio.sleep(0.1)
+            bay = remote.outputs[5]
+            await async_wait_for(lambda: bay.volume is not None, timeout=0.5)
+            assert bay.volume == 50
+        finally:
+            await remote.async_close()
+            await simulator.close()
+    asyncio.run(run())
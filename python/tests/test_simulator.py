@@ -0,0 +1,19 @@
+from proaudio_remote import *
+from conftest import wait_for
+
+def test_remote_reads_and_writes_the_simulator(simulator):
+    simulator.switch.set('VPZ', 1, '40')
+    remote = Remote("127.0.0.1", port=simulator.port)
+    try:
+        wait_for(lambda: remote.ready)
+        bay = remote.outputs[0]
+        assert bay.volume == 40
+        bay.volume = 20
+        assert simulator.switch.get('VPZ', 1) == '20'
+    finally:
+        remote.close()
+
+def test_invalid_commands_are_rejected(simulator):
+    assert simulator.switch.execute('VPZ @009?') == ['^!$']
+    assert simulator.switch.execute('VPZ @001') == ['^!$']
+    assert simulator.switch.execute('VPZ @001,+') == ['^+$', '^=VPZ @001,51$']